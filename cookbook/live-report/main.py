@@ -72,6 +72,8 @@ class DisplayReport:
                                   between_inclusive("rslt_createdOn",
                                                     previous_date, now),
                                   sort=["rslt_fk_test", "rslt_fk_content"])
+            # Fetch the experiment run steps of all the results at once
+            slims.follow_many(records, "rslt_fk_experimentRunStep")
 
             table = []
             for record in records:
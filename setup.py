@@ -23,6 +23,8 @@ CLASSIFIERS = [
     "Topic :: Internet :: WWW/HTTP :: WSGI :: Application",
 ]
 INSTALL_REQUIRES = ["flask>=1.1.0", "requests>=2.25.0", "requests_oauthlib>=1.3.0", "deprecation>=2.0.0"]
+EXTRAS_REQUIRE = {"async": ["httpx>=0.23.0"], "pandas": ["pandas>=1.1.0"], "arrow": ["pyarrow>=3.0.0"],
+                  "orjson": ["orjson>=3.0.0"]}
 
 ###############################################################################
 
@@ -80,4 +82,5 @@ if __name__ == "__main__":
         zip_safe=False,
         classifiers=CLASSIFIERS,
         install_requires=INSTALL_REQUIRES,
+        extras_require=EXTRAS_REQUIRE,
     )
@@ -0,0 +1,192 @@
+import os
+from types import TracebackType
+from typing import Any, List, Optional, Sequence, Type, Union
+
+from .criteria import Criterion
+from .internal import Attachment, Record, _SlimsApi, _SlimsApiException, _project
+from .slims import _fetch_body
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None  # type: ignore[assignment]
+
+
+class AsyncSlims(object):
+    """
+    Creates a new slims instance to work with from asyncio code
+
+    All the calls to slims are coroutines that share one non-blocking
+    connection pool, so a single event loop can have many of them running at
+    the same time. The records that are returned are the same Record and
+    Attachment objects that Slims returns.
+
+    Note:
+        Requires the httpx package (pip install 'slims-python-api[async]')
+
+    Args:
+        url (str): The url of the REST API of this slims instance
+        username (str): The username to login with
+        password (str): The password to login with
+        repo_location (str, optional): The location of the file repository (this can
+            be used to access attachments without needing to download them)
+        max_connections (int, optional): The maximum number of connections
+            open to slims at the same time. Defaults to 100
+        timeout (float, optional): Timeout in seconds for each call. Defaults to 60
+
+    Examples:
+        >>> async with AsyncSlims("http://localhost:9999", "admin", "admin") as slims:
+                contents = await asyncio.gather(*[slims.fetch_by_pk("Content", pk)
+                                                  for pk in range(1, 100)])
+    """
+
+    def __init__(self,
+                 url: str,
+                 username: str,
+                 password: str,
+                 repo_location: str = None,
+                 max_connections: int = 100,
+                 timeout: float = 60):
+        if httpx is None:
+            raise ImportError("AsyncSlims requires httpx, install it with "
+                              "pip install 'slims-python-api[async]'")
+        self.slims_api = _SlimsApi(url, username, password, repo_location)
+        self.client = httpx.AsyncClient(auth=(username, password),
+                                        limits=httpx.Limits(max_connections=max_connections,
+                                                            max_keepalive_connections=max_connections),
+                                        timeout=timeout)
+
+    async def __aenter__(self) -> 'AsyncSlims':
+        return self
+
+    async def __aexit__(self, exc_type: Optional[Type[BaseException]], exc: Optional[BaseException],
+                        traceback: Optional[TracebackType]) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """ Closes the connections of this instance """
+        await self.client.aclose()
+        self.slims_api.close()
+
+    async def fetch(self, table: str, criteria: Criterion, sort: list[str] = None,
+                    start: int = None, end: int = None, columns: list[str] = None) -> List[Record]:
+        """Fetch data by criteria, see Slims.fetch
+
+        Examples:
+            >>> await slims.fetch("Content", start_with("cntn_id", "DNA"))
+        """
+        return await self._get_entities(table + "/advanced", _fetch_body(criteria, sort, start, end), columns)
+
+    async def fetch_by_pk(self, table: str, pk: int, columns: list[str] = None) -> Optional[Record]:
+        """Fetch a record by primary key, see Slims.fetch_by_pk
+
+        Examples:
+            >>> await slims.fetch_by_pk("Content", 1)
+        """
+        entities = await self._get_entities(table + "/" + str(pk), columns=columns)
+        if len(entities) > 0:
+            return entities[0]
+        else:
+            return None
+
+    async def add(self, table: str, values: dict[str, Any]) -> Record:
+        """Add a new record in slims, see Slims.add
+
+        Examples:
+            >>> await slims.add("Content", {"cntn_id": "ID", "cntn_fk_contentType": 1})
+        """
+        response = await self._request("PUT", self.slims_api.url + table, json=values)
+        if response.status_code != 200:
+            raise _SlimsApiException("Add failed: " + response.text, response.status_code)
+        return self.slims_api.record(response.json()["entities"][0])
+
+    async def update(self, record: Record, values: dict[str, Any]) -> Record:
+        """Updates a record, see Record.update
+
+        Examples:
+            >>> content = await slims.update(content, {"cntn_id": "new id"})
+        """
+        response = await self._request("POST", self._record_url(record), json=values)
+        if response.status_code != 200:
+            raise _SlimsApiException("Update failed: " + response.text, response.status_code)
+        return self.slims_api.record(response.json()["entities"][0])
+
+    async def remove(self, record: Record) -> None:
+        """Removes a record, see Record.remove
+
+        Examples:
+            >>> await slims.remove(content)
+        """
+        response = await self._request("DELETE", self._record_url(record))
+        if response.status_code != 200:
+            raise _SlimsApiException("Delete failed: " + response.text, response.status_code)
+
+    async def follow(self, record: Record, link_name: str) -> Union[Optional[Record], Sequence[Record]]:
+        """Follows an incoming or outgoing foreign key of a record, see Record.follow
+
+        Examples:
+            >>> content_type = await slims.follow(content, "cntn_fk_contentType")
+            >>> results = await slims.follow(content, "-rslt_fk_content")
+        """
+        try:
+            href = record.links()[link_name]
+        except KeyError:
+            raise KeyError(str(link_name) + " not found in the list of links") from None
+        entities = await self._get_entities(href)
+        if link_name.startswith("-"):
+            return entities
+        else:
+            if len(entities) > 0:
+                return entities[0]
+            else:
+                return None
+
+    async def attachments(self, record: Record) -> List[Record]:
+        """The attachments related to a record, see Record.attachments
+
+        Examples:
+            >>> attachments = await slims.attachments(content)
+        """
+        return await self._get_entities("attachment/" + record.table_name() + "/" + str(record.pk()))
+
+    async def download_to(self, attachment: Attachment, location: str, chunk_size: int = 1024 * 1024) -> None:
+        """Downloads an attachment to a file on disk, see Attachment.download_to
+
+        Examples:
+            >>> await slims.download_to(attachment, "test.txt")
+        """
+        url = self.slims_api.url + "repo/" + str(attachment.pk())
+        part = location + ".part"
+        async with self.client.stream("GET", url, headers=_SlimsApi._headers()) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise _SlimsApiException("Download failed: " + response.text, response.status_code)
+            try:
+                with open(part, 'wb') as destination:
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        destination.write(chunk)
+                os.replace(part, location)
+            except BaseException:
+                if os.path.exists(part):
+                    os.remove(part)
+                raise
+
+    async def _get_entities(self, url: str, body: dict[str, Any] = None,
+                            columns: Sequence[str] = None) -> List[Record]:
+        response = await self._request("GET", self.slims_api.entities_url(url), json=body)
+        if response.status_code == 200:
+            entities = response.json()["entities"]
+            if columns is not None:
+                wanted = set(columns)
+                for entity in entities:
+                    _project(entity, wanted)
+            return [self.slims_api.record(entity) for entity in entities]
+        else:
+            raise _SlimsApiException(
+                "Could not fetch entities: " + response.text, response.status_code)
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> 'httpx.Response':
+        return await self.client.request(method, url, headers=_SlimsApi._headers(), **kwargs)
+
+    def _record_url(self, record: Record) -> str:
+        return self.slims_api.url + record.table_name() + "/" + str(record.pk())
@@ -0,0 +1,102 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Sequence
+
+from .retry import RetryPolicy
+
+
+class BulkResult(object):
+    """ The outcome of an operation done on many rows at once
+
+    Attributes:
+        results (list): The result for every input row, in input order
+            (None for the rows that failed)
+        errors (dict): The exception raised for every row that failed, by
+            index of the row
+        elapsed (float): The duration of the whole operation, in seconds
+        retries (int): The number of times a row was tried again after a
+            transient failure
+        transferred (int): The number of bytes transferred, for operations
+            on files
+
+    Examples:
+        >>> result = slims.add_many("Content", rows)
+            for index, error in result.errors.items():
+                print("Row", index, "failed:", error)
+    """
+
+    def __init__(self, size: int):
+        self.results: list[Any] = [None] * size
+        self.errors: dict[int, Exception] = {}
+        self.elapsed = 0.0
+        self.retries = 0
+        self.transferred = 0
+
+    @property
+    def succeeded(self) -> int:
+        """ The number of rows that succeeded """
+        return len(self.results) - len(self.errors)
+
+    @property
+    def failed(self) -> int:
+        """ The number of rows that failed """
+        return len(self.errors)
+
+    @property
+    def throughput(self) -> float:
+        """ The number of rows handled per second """
+        return len(self.results) / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def transfer_rate(self) -> float:
+        """ The number of bytes transferred per second """
+        return self.transferred / self.elapsed if self.elapsed > 0 else 0.0
+
+    def raise_for_errors(self) -> None:
+        """ Raises the error of the first row that failed, if any """
+        if self.errors:
+            raise self.errors[min(self.errors)]
+
+    def __repr__(self) -> str:
+        return "BulkResult(succeeded=%d, failed=%d, retries=%d, elapsed=%.2fs, throughput=%.1f/s)" % (
+            self.succeeded, self.failed, self.retries, self.elapsed, self.throughput)
+
+
+def run_all(function: Callable[..., Any], arguments: Sequence[tuple], batch_size: int,
+            max_workers: int, retry_policy: RetryPolicy = None) -> BulkResult:
+    """ Calls function for every tuple of arguments on a pool of max_workers
+    threads, batch_size calls at a time. A call that raises does not stop the
+    others, its exception ends up in the errors of the result. Calls failing
+    with a transient error are tried again as retry_policy decides. """
+    result = BulkResult(len(arguments))
+    lock = threading.Lock()
+
+    def call(*args: Any) -> Any:
+        attempt = 1
+        while True:
+            try:
+                return function(*args)
+            except Exception as e:
+                wait = retry_policy.retry_failure(e, attempt) if retry_policy is not None else None
+                if wait is None:
+                    raise
+            with lock:
+                result.retries += 1
+            time.sleep(wait)
+            attempt += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch_start in range(0, len(arguments), batch_size):
+            # The requested-for user lives in a context variable, copy it over to the workers
+            futures = [(index, executor.submit(contextvars.copy_context().run, call, *arguments[index]))
+                       for index in range(batch_start, min(batch_start + batch_size, len(arguments)))]
+            for index, future in futures:
+                try:
+                    result.results[index] = future.result()
+                except Exception as e:
+                    result.errors[index] = e
+    result.elapsed = time.perf_counter() - start
+    return result
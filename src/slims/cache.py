@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import AbstractSet, Any, Hashable, List, Optional
+
+
+class RecordCache(object):
+    """
+    Keeps the entities returned by slims in memory, so fetching the same
+    records again does not call slims
+
+    Fetches (fetch, fetch_by_pk, fetch_frame, following links) are cached by
+    url, criteria, sort, columns and requested-for user. An entry expires
+    after the time to live of its table, and the least recently used entries
+    are dropped once max_size fetches are cached. Adding, updating or removing
+    a record through the same Slims instance drops the cached fetches of its
+    table.
+
+    When slims sent an ETag or Last-Modified header with the entities, an
+    expired entry is not dropped but revalidated: the next fetch asks slims
+    whether the entities changed since, and reuses them when they did not.
+
+    Note:
+        Changes made by anyone else are only seen once the entry expired,
+        only cache tables that rarely change (types, locations, ...) for long.
+
+    Args:
+        max_size (int, optional): The maximum number of cached fetches.
+            Defaults to 1024
+        ttl (float, optional): The time to live of an entry, in seconds.
+            Defaults to 300
+        table_ttls (dict, optional): The time to live of the entries of a
+            table, by table name, overriding ttl. 0 disables the cache for
+            a table
+
+    Attributes:
+        hits (int): The number of fetches answered by the cache
+        misses (int): The number of fetches that called slims
+        evictions (int): The number of entries dropped because the cache was full
+        invalidations (int): The number of entries dropped after a change
+        revalidations (int): The number of expired entries slims confirmed
+            to be unchanged
+
+    Examples:
+        >>> cache = RecordCache(table_ttls={"ContentType": 3600, "Location": 3600})
+            slims = Slims("slims", "http://localhost:9999", "admin", "admin",
+                          cache=cache)
+            slims.fetch("ContentType", None)
+            slims.fetch("ContentType", None)
+            print(cache.hits, cache.misses)
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300, table_ttls: dict[str, float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.table_ttls = dict(table_ttls or {})
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.revalidations = 0
+        # Bumped by every invalidation, so that a fetch that was already
+        # running when its table changed does not store stale entities
+        self.generation = 0
+        self._entries: OrderedDict[Hashable, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[List[dict[str, Any]]]:
+        """
+        Returns:
+            The cached entities, None when they are not cached (anymore).
+            The entities are shared, do not change them
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                # Entries that can be revalidated are kept until they are
+                # replaced (or evicted)
+                if not entry.validators:
+                    del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.entities
+
+    def put(self, key: Hashable, tables: AbstractSet[str], entities: List[dict[str, Any]],
+            generation: int, validators: dict[str, str] = None) -> None:
+        """ Caches the entities of tables fetched for key
+
+        Nothing is cached when the cache was invalidated since generation.
+        validators are the headers that make a request for key conditional.
+        """
+        ttl = min(self.table_ttls.get(table, self.ttl) for table in tables) if tables else self.ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = _CacheEntry(frozenset(tables), entities, ttl, validators or {})
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def validators(self, key: Hashable) -> dict[str, str]:
+        """
+        Returns:
+            The headers that make a request for key conditional, empty when
+            nothing can be revalidated for key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry.validators) if entry is not None else {}
+
+    def revalidate(self, key: Hashable, generation: int) -> Optional[List[dict[str, Any]]]:
+        """ Marks the entry of key as fresh again, after slims confirmed it
+        did not change
+
+        Returns:
+            The cached entities, None when the entry is gone or the cache was
+            invalidated since generation. The entities are shared, do not
+            change them
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or generation != self.generation:
+                return None
+            entry.expires = time.monotonic() + entry.ttl
+            self._entries.move_to_end(key)
+            self.revalidations += 1
+            return entry.entities
+
+    def invalidate(self, table: str = None) -> None:
+        """ Drops the cached fetches of table, or all of them """
+        with self._lock:
+            self.generation += 1
+            if table is None:
+                stale = list(self._entries)
+            else:
+                stale = [key for key, entry in self._entries.items() if table in entry.tables]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _CacheEntry(object):
+    __slots__ = ("tables", "entities", "ttl", "expires", "validators")
+
+    def __init__(self, tables: AbstractSet[str], entities: List[dict[str, Any]], ttl: float,
+                 validators: dict[str, str]):
+        self.tables = tables
+        self.entities = entities
+        self.ttl = ttl
+        self.expires = time.monotonic() + ttl
+        self.validators = validators
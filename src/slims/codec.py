@@ -0,0 +1,74 @@
+import json
+import math
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+
+class JsonCodec(object):
+    """ Encodes the bodies sent to slims and decodes the bodies it returns,
+    using the json module of the standard library.
+
+    Subclass it and pass an instance as json_codec to Slims to use another
+    json library.
+
+    Note:
+        The entities fetched with this codec are decoded while they are
+        coming in. A codec overriding loads decodes each response at once,
+        which is faster but holds the whole response in memory.
+    """
+
+    def dumps(self, value: Any) -> bytes:
+        """ Serializes value to utf-8 encoded json """
+        return json.dumps(value, allow_nan=False).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        """ Deserializes utf-8 encoded json """
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """ A JsonCodec using orjson, which is several times faster than the
+    standard library. Install orjson and pass an instance as json_codec to
+    Slims to use it.
+
+    Note:
+        Unlike the standard library, orjson serializes datetimes (as
+        RFC 3339 strings). Fetched entities are decoded once the whole
+        response has been received, instead of while it comes in.
+    """
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise ImportError("OrjsonCodec requires orjson, install it with pip install orjson")
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            encoded = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson is stricter for a few values the standard library accepts
+            # (integers larger than 64 bits for example)
+            return super().dumps(value)
+        if b"null" in encoded:
+            # orjson sends NaN and infinity as null, refuse them like the
+            # standard library does instead of clearing values
+            _check_finite(value)
+        return encoded
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+def _check_finite(value: Any) -> None:
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError("Out of range float values are not JSON compliant: " + repr(value))
+    elif isinstance(value, dict):
+        for item in value.values():
+            _check_finite(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _check_finite(item)
@@ -0,0 +1,119 @@
+from typing import Any, Optional, Sequence
+
+UNIT_SUFFIX = "_unit"
+DISPLAY_SUFFIX = "_display"
+
+
+def to_pandas(entities: Sequence[dict[str, Any]], columns: Sequence[str] = None) -> Any:
+    """Turns json entities returned by slims into a pandas DataFrame
+
+    There is one row per entity and one column per slims column, plus a "pk"
+    column. The type of a column depends on its slims datatype:
+
+    * DATE columns hold datetime64 values
+    * QUANTITY columns hold the value, the unit is in an extra "<name>_unit" column
+    * FOREIGN_KEY columns hold the primary key of the linked record, its
+      display value is in an extra "<name>_display" column
+    * other columns hold their value
+
+    Note:
+        Requires the pandas package (pip install 'slims-python-api[pandas]')
+
+    Args:
+        entities (list): The json entities
+        columns (list, optional): The slims columns to keep, defaults to all of them
+
+    Returns:
+        A pandas DataFrame
+    """
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError("pandas is required, install it with "
+                          "pip install 'slims-python-api[pandas]'") from None
+
+    data: dict[str, Any] = {}
+    for name, datatype, values in _decode(entities, columns):
+        if datatype == "DATE":
+            data[name] = pandas.to_datetime(values[0], unit="ms")
+        elif datatype == "QUANTITY":
+            data[name] = pandas.array(values[0], dtype="Float64")
+            data[name + UNIT_SUFFIX] = values[1]
+        elif datatype == "FOREIGN_KEY":
+            data[name] = pandas.array(values[0], dtype="Int64")
+            data[name + DISPLAY_SUFFIX] = values[1]
+        else:
+            data[name] = values[0]
+    return pandas.DataFrame(data)
+
+
+def to_arrow(entities: Sequence[dict[str, Any]], columns: Sequence[str] = None) -> Any:
+    """Turns json entities returned by slims into an Arrow table
+
+    The columns are the same as the ones of to_pandas.
+
+    Note:
+        Requires the pyarrow package (pip install 'slims-python-api[arrow]')
+
+    Args:
+        entities (list): The json entities
+        columns (list, optional): The slims columns to keep, defaults to all of them
+
+    Returns:
+        A pyarrow Table
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is required, install it with "
+                          "pip install 'slims-python-api[arrow]'") from None
+
+    data: dict[str, Any] = {}
+    for name, datatype, values in _decode(entities, columns):
+        if datatype == "DATE":
+            data[name] = pyarrow.array(values[0], type=pyarrow.timestamp("ms"))
+        elif datatype == "QUANTITY":
+            data[name] = pyarrow.array(values[0], type=pyarrow.float64())
+            data[name + UNIT_SUFFIX] = pyarrow.array(values[1], type=pyarrow.string())
+        elif datatype == "FOREIGN_KEY":
+            data[name] = pyarrow.array(values[0], type=pyarrow.int64())
+            data[name + DISPLAY_SUFFIX] = pyarrow.array(values[1], type=pyarrow.string())
+        else:
+            data[name] = pyarrow.array(values[0])
+    return pyarrow.table(data)
+
+
+def _decode(entities: Sequence[dict[str, Any]],
+            columns: Optional[Sequence[str]]) -> list[tuple[str, Optional[str], tuple[list[Any], list[Any]]]]:
+    """ Splits the entities into (name, datatype, (values, extra values)) per column """
+    if columns is None:
+        columns = []
+        seen = set()
+        for entity in entities:
+            for json_column in entity["columns"]:
+                if json_column["name"] not in seen:
+                    seen.add(json_column["name"])
+                    columns.append(json_column["name"])
+
+    index = {name: position for position, name in enumerate(columns)}
+    datatypes: list[Optional[str]] = [None] * len(columns)
+    values: list[list[Any]] = [[None] * len(entities) for name in columns]
+    extras: list[list[Any]] = [[None] * len(entities) for name in columns]
+    for row, entity in enumerate(entities):
+        for json_column in entity["columns"]:
+            position = index.get(json_column["name"])
+            if position is None:
+                continue
+            if datatypes[position] is None:
+                datatypes[position] = json_column.get("datatype")
+            values[position][row] = json_column.get("value")
+            if datatypes[position] == "QUANTITY":
+                extras[position][row] = json_column.get("unit")
+            elif datatypes[position] == "FOREIGN_KEY":
+                extras[position][row] = json_column.get("displayValue")
+
+    decoded: list[tuple[str, Optional[str], tuple[list[Any], list[Any]]]] = [
+        ("pk", "INTEGER", ([entity["pk"] for entity in entities], []))]
+    for position, name in enumerate(columns):
+        decoded.append((name, datatypes[position], (values[position], extras[position])))
+    return decoded
@@ -1,20 +1,42 @@
 import base64
+import codecs
+import hashlib
+import io
+import json
+import mmap
 import os
-from typing import Any, Callable, List, Optional, Sequence, Union
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from typing import IO, AbstractSet, Any, Callable, Iterable, Iterator, List, Optional, Sequence, Union
 
 import requests
+import requests.adapters
 from requests_oauthlib import OAuth2Session
 from werkzeug.local import Local
 
+from .cache import RecordCache
+from .codec import JsonCodec
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+
 local = Local()
 
+_STREAM_CHUNK_SIZE = 64 * 1024
+
 
 def _slims_local() -> Local:
     return local
 
 
 class _SlimsApiException(Exception):
-    pass
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class _SlimsApi(object):
@@ -28,7 +50,14 @@ class _SlimsApi(object):
                  token_updater: Callable = None,
                  redirect_url: str = "",
                  client_id: str = None,
-                 client_secret: str = None):
+                 client_secret: str = None,
+                 pool_size: int = 10,
+                 codec: JsonCodec = None,
+                 retry_policy: RetryPolicy = None,
+                 rate_limiter: RateLimiter = None,
+                 max_in_flight: int = None,
+                 coalesce: bool = True,
+                 cache: RecordCache = None):
         self.url = url + "/rest/"
         self.raw_url = url + "/"
         self.username = username
@@ -37,6 +66,17 @@ class _SlimsApi(object):
         self.oauth = oauth
         self.client_id = client_id
         self.client_secret = client_secret
+        self.codec = codec if codec is not None else JsonCodec()
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.in_flight = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        self.coalesce = coalesce
+        self._flights: dict[tuple, _Flight] = {}
+        # Bumped after every write to a table, so that fetches made after a
+        # write do not join a call for that table sent before it
+        self._epochs: dict[str, int] = {}
+        self._flights_lock = threading.Lock()
+        self.cache = cache
         if oauth:
             if self.client_id is None:
                 raise _SlimsApiException(
@@ -49,74 +89,265 @@ class _SlimsApi(object):
                                                scope=["api"],
                                                auto_refresh_url=self.raw_url + "oauth/token",
                                                token_updater=token_updater)
+            self.session: requests.Session = self.oauth_session
+        else:
+            self.session = requests.Session()
+            if username is not None and password is not None:
+                self.session.auth = (username, password)
+        # Keep-alive connections are reused from this pool by every call (and
+        # every thread) going through this api instead of reconnecting each time
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                                pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.schemas: dict[str, _TableSchema] = {}
+
+    def get_entities(self, url: str, body: dict[str, Any] = None,
+                     columns: Sequence[str] = None) -> List['Record']:
+        if self.cache is None and not self.coalesce:
+            # Nothing to share the response with, build the records while it comes in
+            return list(self.iter_entities(url, body, columns))
+        return [self.record(entity) for entity in self.get_json_entities(url, body, columns)]
+
+    def iter_entities(self, url: str, body: dict[str, Any] = None,
+                      columns: Sequence[str] = None) -> Iterator['Record']:
+        """ Like get_entities, but yields every record as soon as its entity
+        has been received. Never shared with identical fetches, but still
+        read from and stored in the cache when there is one """
+        if self.cache is not None:
+            yield from self.get_entities(url, body, columns)
+            return
+        for entity in self.iter_json_entities(url, body, columns):
+            yield self.record(entity)
+
+    def get_json_entities(self, url: str, body: dict[str, Any] = None,
+                          columns: Sequence[str] = None) -> List[dict[str, Any]]:
+        """ Like get_entities, but returns the json entities as returned by slims
+
+        When columns is given, all the other columns are dropped from the entities.
+
+        Identical calls (same url, body, columns and requested-for user) made
+        while one of them is waiting for slims share its response instead of
+        each sending their own, every caller gets its own copy of the entities.
+        When a cache is set, the entities are read from and stored in it, and
+        expired entities are revalidated with a conditional request.
+        """
+        key = (self.entities_url(url),
+               None if body is None else self.codec.dumps(body),
+               None if columns is None else tuple(columns),
+               _SlimsApi._headers().get('X-SLIMS-REQUESTED-FOR'))
+        cache = self.cache
+        conditional: dict[str, str] = {}
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return _copy_json(cached)
+            conditional = cache.validators(key)
+
+        entities, validators, generation, shared = self._fetch_json_entities(url, body, columns, key, conditional)
+        if entities is None and cache is not None:
+            # Not modified, unless the entry was dropped in the meantime
+            entities = cache.revalidate(key, generation)
+            if entities is not None:
+                return _copy_json(entities)
+            entities, validators, generation, shared = self._fetch_json_entities(url, body, columns, key, {})
+        assert entities is not None
+        if cache is not None:
+            tables = {entity["tableName"] for entity in entities}
+            tables.add(self._table_of(url))
+            cache.put(key, tables, entities, generation, validators)
+            shared = True
+        return _copy_json(entities) if shared else entities
+
+    def _fetch_json_entities(self, url: str, body: Optional[dict[str, Any]], columns: Optional[Sequence[str]],
+                             key: tuple, conditional: dict[str, str]
+                             ) -> tuple[Optional[List[dict[str, Any]]], dict[str, str], int, bool]:
+        """ Returns the entities (None when they were not modified), the
+        headers to revalidate them later, the cache generation from before
+        they were requested and whether other callers got them as well """
+        if not self.coalesce:
+            return self._generation_and_download(url, body, columns, conditional) + (False,)
 
-    def get_entities(self, url: str, body: dict[str, Any] = None) -> List['Record']:
-        if(self.url.startswith('https') and url.startswith('http') and url[4:].startswith(self.url[5:])):
+        table = self._table_of(url)
+        with self._flights_lock:
+            # A conditional call can have a different outcome than a plain one
+            key = key + (self._epochs.get(table, 0),) + tuple(sorted(conditional.items()))
+            flight = self._flights.get(key)
+            following = flight is not None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.followers += 1
+        if following:
+            return flight.result() + (True,)
+
+        try:
+            result = self._generation_and_download(url, body, columns, conditional)
+        except BaseException as e:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.set_exception(e)
+            raise
+        with self._flights_lock:
+            del self._flights[key]
+        flight.set_result(result)
+        # No one can join anymore, the entities are only shared when
+        # followers are reading them as well
+        return result + (flight.followers > 0,)
+
+    def _generation_and_download(self, url: str, body: Optional[dict[str, Any]], columns: Optional[Sequence[str]],
+                                 conditional: dict[str, str]
+                                 ) -> tuple[Optional[List[dict[str, Any]]], dict[str, str], int]:
+        # Entities are only cached when their table did not change since
+        # before they were requested, whoever is caching them
+        generation = self.cache.generation if self.cache is not None else 0
+        return self._download_json_entities(url, body, columns, conditional) + (generation,)
+
+    def _download_json_entities(self, url: str, body: Optional[dict[str, Any]], columns: Optional[Sequence[str]],
+                                conditional: dict[str, str]) -> tuple[Optional[List[dict[str, Any]]], dict[str, str]]:
+        response = self._request("GET", self.entities_url(url), body, stream=True, headers=conditional)
+        try:
+            if response.status_code == 304 and conditional:
+                return None, conditional
+            validators = {}
+            if "ETag" in response.headers:
+                validators["If-None-Match"] = response.headers["ETag"]
+            if "Last-Modified" in response.headers:
+                validators["If-Modified-Since"] = response.headers["Last-Modified"]
+            return list(self._entities(response, columns)), validators
+        finally:
+            response.close()
+
+    def iter_json_entities(self, url: str, body: dict[str, Any] = None,
+                           columns: Sequence[str] = None) -> Iterator[dict[str, Any]]:
+        """ Like get_json_entities, but yields every entity as soon as it has
+        been received instead of waiting for (and holding) the whole response """
+        response = self._request("GET", self.entities_url(url), body, stream=True)
+        try:
+            yield from self._entities(response, columns)
+        finally:
+            response.close()
+
+    def _entities(self, response: requests.Response, columns: Optional[Sequence[str]]) -> Iterator[dict[str, Any]]:
+        if response.status_code != 200:
+            raise _SlimsApiException(
+                "Could not fetch entities: " + response.text, response.status_code)
+        wanted = set(columns) if columns is not None else None
+        entities: Iterable[dict[str, Any]]
+        if type(self.codec).loads is JsonCodec.loads:
+            # The standard library decoder can decode the entities while they
+            # are coming in
+            entities = _EntityStream(response.iter_content(_STREAM_CHUNK_SIZE))
+        else:
+            entities = self.codec.loads(response.content).get("entities", [])
+        for entity in entities:
+            if wanted is not None:
+                _project(entity, wanted)
+            yield entity
+
+    def entities_url(self, url: str) -> str:
+        """ Turns a (relative or followed link) url into an absolute rest url """
+        if (self.url.startswith('https') and url.startswith('http') and url[4:].startswith(self.url[5:])):
             url = 'https' + url[4:]
         if not url.startswith(self.url):
             url = self.url + url
+        return url
 
-        if self.oauth:
-            response = self.oauth_session.get(
-                url, headers=_SlimsApi._headers(), json=body)
-        else:
-            response = requests.get(url,
-                                    auth=(self.username, self.password),
-                                    headers=_SlimsApi._headers(),
-                                    json=body)
-        records: List['Record'] = []
-        if response.status_code == 200:
-            for entity in response.json()["entities"]:
-                if entity["tableName"] == "Attachment":
-                    records.append(Attachment(entity, self))
-                else:
-                    records.append(Record(entity, self))
-            return records
-        else:
-            raise _SlimsApiException(
-                "Could not fetch entities: " + response.text)
+    def _table_of(self, url: str) -> str:
+        """ The table a (relative or absolute) rest url is about """
+        path = self.entities_url(url)[len(self.url):]
+        table = re.split(r"[/?]", path, maxsplit=1)[0]
+        return "Attachment" if table in ("attachment", "repo") else table
 
-    def get(self, url: str) -> requests.Response:
-        if self.oauth:
-            return self.oauth_session.get(self.url + url,
-                                          headers=_SlimsApi._headers(),
-                                          client_id=self.client_id,
-                                          client_secret=self.client_secret)
+    def record(self, entity: dict[str, Any]) -> 'Record':
+        """ Wraps a json entity returned by slims in a record
+
+        The column metadata of the entity is moved to the schema of its table,
+        which is shared by all the records of that table.
+        """
+        schema = self.schemas.get(entity["tableName"])
+        if schema is None:
+            schema = self.schemas.setdefault(entity["tableName"], _TableSchema(entity["tableName"]))
+        schema.intern(entity)
+        if entity["tableName"] == "Attachment":
+            return Attachment(entity, self, schema)
         else:
-            return requests.get(self.url + url,
-                                auth=(self.username, self.password), headers=_SlimsApi._headers())
+            return Record(entity, self, schema)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self._request("GET", self.url + url, **kwargs)
 
     def post(self, url: str, body: dict[str, Any] = None) -> requests.Response:
-        if self.oauth:
-            return self.oauth_session.post(self.url + url,
-                                           json=body,
-                                           headers=_SlimsApi._headers(),
-                                           client_id=self.client_id,
-                                           client_secret=self.client_secret)
-        else:
-            return requests.post(self.url + url, json=body,
-                                 auth=(self.username, self.password), headers=_SlimsApi._headers())
+        return self._request("POST", self.url + url, body)
 
     def put(self, url: str, body: dict[str, Any] = None) -> requests.Response:
-        if self.oauth:
-            return self.oauth_session.put(self.url + url,
-                                          json=body,
-                                          headers=_SlimsApi._headers(),
-                                          client_id=self.client_id,
-                                          client_secret=self.client_secret)
-        else:
-            return requests.put(self.url + url, json=body,
-                                auth=(self.username, self.password), headers=_SlimsApi._headers())
+        return self._request("PUT", self.url + url, body)
 
     def delete(self, url: str) -> requests.Response:
+        return self._request("DELETE", self.url + url)
+
+    def close(self) -> None:
+        """ Closes the pooled connections of this api """
+        self.session.close()
+
+    def decode(self, response: requests.Response) -> Any:
+        """ Decodes the json body of a response with the codec of this api """
+        return self.codec.loads(response.content)
+
+    def _request(self, method: str, url: str, body: Any = None, **kwargs: Any) -> requests.Response:
+        headers = _SlimsApi._headers()
+        headers.update(kwargs.pop("headers", None) or {})
+        if body is not None:
+            kwargs["data"] = self.codec.dumps(body)
+            headers["Content-Type"] = "application/json"
         if self.oauth:
-            return self.oauth_session.delete(self.url + url,
-                                             headers=_SlimsApi._headers(),
-                                             client_id=self.client_id,
-                                             client_secret=self.client_secret)
-        else:
-            return requests.delete(self.url + url,
-                                   auth=(self.username, self.password), headers=_SlimsApi._headers())
+            kwargs["client_id"] = self.client_id
+            kwargs["client_secret"] = self.client_secret
+        if method != "GET" and url.startswith(self.url):
+            try:
+                return self._retrying(method, url, headers, kwargs)
+            finally:
+                self._wrote(self._table_of(url))
+        return self._retrying(method, url, headers, kwargs)
+
+    def _wrote(self, table: str) -> None:
+        """ Makes sure later fetches of table see what was written to it """
+        with self._flights_lock:
+            self._epochs[table] = self._epochs.get(table, 0) + 1
+        if self.cache is not None:
+            self.cache.invalidate(table)
+
+    def _retrying(self, method: str, url: str, headers: dict[str, str], kwargs: dict[str, Any]) -> requests.Response:
+        policy = self.retry_policy
+        if policy is None:
+            return self._send(method, url, headers, kwargs)
+
+        attempt = 1
+        while True:
+            policy._attempted()
+            try:
+                response = self._send(method, url, headers, kwargs)
+            except requests.RequestException as e:
+                wait = policy.retry_error(method, e, attempt)
+                if wait is None:
+                    raise
+            else:
+                wait = policy.retry_response(method, response, attempt)
+                if wait is None:
+                    return response
+                response.close()
+            time.sleep(wait)
+            attempt += 1
+
+    def _send(self, method: str, url: str, headers: dict[str, str], kwargs: dict[str, Any]) -> requests.Response:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if self.in_flight is None:
+            return self.session.request(method, url, headers=headers, **kwargs)
+        # Only the wait for the response headers counts as in flight, a
+        # streamed body is read after the slot is given back
+        with self.in_flight:
+            return self.session.request(method, url, headers=headers, **kwargs)
 
     def authorization_url(self) -> str:
         return self.oauth_session.authorization_url(self.raw_url + "oauth/authorize")[0]
@@ -135,30 +366,244 @@ class _SlimsApi(object):
             return {}
 
 
+class _Flight(Future):
+    """ A get_json_entities call in progress, and the callers waiting for it """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.followers = 0
+
+
+def _copy_json(value: Any) -> Any:
+    """ A deep copy of decoded json, several times faster than copy.deepcopy """
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+class _EntityStream(object):
+    """ Yields the entities of a {"entities": [...]} json document while its
+    bytes are coming in, so neither the whole body nor all the decoded
+    entities have to be in memory at once. """
+
+    _non_whitespace = re.compile(r"[^ \t\n\r]")
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._exhausted = False
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "entities":
+                self._expect("[")
+                if self._peek() == "]":
+                    self._position += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(",", "]") == "]":
+                            break
+            else:
+                self._value()
+            if self._expect(",", "}") == "}":
+                return
+
+    def _fill(self, minimum: int = 1) -> bool:
+        """ Reads at least minimum more characters (or all that is left) into
+        the buffer, returns False when there is nothing left """
+        if self._exhausted:
+            return False
+        texts = [self._buffer[self._position:]]
+        read = 0
+        while read < minimum:
+            try:
+                text = self._text_decoder.decode(next(self._chunks))
+            except StopIteration:
+                text = self._text_decoder.decode(b"", final=True)
+                self._exhausted = True
+            texts.append(text)
+            read += len(text)
+            if self._exhausted:
+                break
+        self._buffer = "".join(texts)
+        self._position = 0
+        return True
+
+    def _peek(self) -> str:
+        """ Skips whitespace and returns the next character """
+        while True:
+            match = self._non_whitespace.search(self._buffer, self._position)
+            if match is not None:
+                self._position = match.start()
+                return self._buffer[self._position]
+            self._position = len(self._buffer)
+            if not self._fill():
+                raise ValueError("Unexpected end of the entities")
+
+    def _expect(self, *expected: str) -> str:
+        char = self._peek()
+        if char not in expected:
+            raise ValueError("Expected " + " or ".join(expected) + " in the entities at: "
+                             + self._buffer[self._position:self._position + 20])
+        self._position += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                # The value is not complete yet. It is decoded again from its
+                # start with (at least) twice as much text, so large values
+                # are not decoded once for every chunk
+                if not self._fill(len(self._buffer) - self._position):
+                    raise
+                continue
+            # A number at the end of the buffer might continue in the next chunk
+            if end < len(self._buffer) or not self._fill():
+                self._position = end
+                return value
+
+
+def _project(entity: dict[str, Any], columns: AbstractSet[str]) -> None:
+    entity["columns"] = [json_column for json_column in entity["columns"] if json_column["name"] in columns]
+
+
+class _TableSchema(object):
+    """ The column metadata (title, datatype, ...) of a table
+
+    Slims repeats this metadata for every entity it returns. It is kept once
+    here and removed from the json of the records, which only keep what is
+    specific to them (value, displayValue, unit, ...).
+    """
+
+    SHARED_KEYS = ("title", "datatype", "position", "hidden", "editable", "subType")
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.columns: dict[str, dict[str, Any]] = {}
+        self.positions: dict[str, int] = {}
+
+    def intern(self, json_entity: dict[str, Any]) -> None:
+        json_columns = json_entity["columns"]
+        for position, json_column in enumerate(json_columns):
+            name = json_column["name"]
+            metadata = self.columns.get(name)
+            if metadata is None:
+                metadata = {key: json_column[key] for key in self.SHARED_KEYS if key in json_column}
+                self.columns[name] = metadata
+                self.positions[name] = position
+            for key, value in metadata.items():
+                if json_column.get(key, metadata) == value:
+                    del json_column[key]
+            # Dicts do not shrink when keys are removed, a copy does
+            json_columns[position] = json_column.copy()
+
+
 class Column(object):
+    """ A column of a record. Its properties (value, displayValue, unit,
+    datatype, ...) are read from the json returned by slims when they are
+    accessed, nothing is copied.
+
+    Changing the value of a column marks it as changed on its record, see
+    Record.save.
+
+    Examples:
+        >>> print(content.cntn_id.value)
+        >>> content.cntn_id.value = "new id"
+    """
+
+    __slots__ = ("_json", "_metadata", "_record")
+
+    def __init__(self, json_column: dict[str, Any], metadata: dict[str, Any] = None,
+                 record: 'Record' = None):
+        self._json = json_column
+        self._metadata = metadata if metadata is not None else {}
+        self._record = record
+
+    def __getattr__(self, name: str) -> Any:
+        if name in Column.__slots__:
+            raise AttributeError(name)
+        try:
+            return self._json[name]
+        except KeyError:
+            pass
+        try:
+            return self._metadata[name]
+        except KeyError:
+            raise AttributeError(name) from None
 
-    def __init__(self, json_column: dict[str, Any]):
-        self.__dict__.update(json_column)
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in Column.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            self._json[name] = value
+            if name == "value" and self._record is not None:
+                self._record._mark_changed(self._json["name"])
 
 
 class Record(object):
     """ A single record in SLims. Can be of any table, represents one row in the
     database
 
-    Columns can be accessed as properties.
+    Columns can be accessed as properties, assigning a value to such a
+    property changes the value of the column. For records returned by slims the
+    column metadata (title, datatype, ...) is shared by all the records of
+    the same table, see schema.
 
     Examples:
         >>> content = slims.fetch_by_pk("Content", 1)
             print(content.cntn_id.value)
+            content.cntn_id = "new id"
+            content.save()
     """
 
-    def __init__(self, json_entity: dict[str, Any], slims_api: _SlimsApi):
+    # Regular attributes, never mistaken for columns
+    _attributes = frozenset(("json_entity", "slims_api", "schema"))
+
+    def __init__(self, json_entity: dict[str, Any], slims_api: _SlimsApi, schema: _TableSchema = None):
         self.json_entity = json_entity
         self.slims_api = slims_api
+        self.schema = schema
+        self._followed: dict[str, Any] = {}
+        self._json_columns: Optional[dict[str, dict[str, Any]]] = None
+        self._links: Optional[dict[str, str]] = None
+        self._changed: Optional[set[str]] = None
+
+    def __getattr__(self, name: str) -> Column:
+        # Only called when name is not a regular attribute: columns are
+        # created on first access and then kept as regular attributes
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self.column(name)
+        except KeyError:
+            raise AttributeError(name) from None
 
-        for json_column in json_entity["columns"]:
-            column = Column(json_column)
-            self.__dict__[column.name] = column
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Assigning to a column changes its value, like assigning to
+        # column(name).value does
+        if not name.startswith("_") and name not in Record._attributes and not isinstance(value, Column):
+            try:
+                column = self.column(name)
+            except KeyError:
+                pass
+            else:
+                column.value = value
+                return
+        object.__setattr__(self, name, value)
 
     def update(self, values: dict[str, Any]) -> 'Record':
         """ Updates this record
@@ -179,9 +624,56 @@ class Record(object):
         url = self.table_name() + "/" + str(self.pk())
         response = self.slims_api.post(url=url, body=values)
         if response.status_code != 200:
-            raise _SlimsApiException("Update failed: " + response.text)
-        new_values = response.json()["entities"][0]
-        return Record(new_values, self.slims_api)
+            raise _SlimsApiException("Update failed: " + response.text, response.status_code)
+        new_values = self.slims_api.decode(response)["entities"][0]
+        return self.slims_api.record(new_values)
+
+    def save(self) -> 'Record':
+        """ Sends the column values changed on this record to slims
+
+        Only the changed columns are sent. When nothing changed, slims is not
+        contacted. Afterwards this record holds the values returned by slims.
+
+        Returns:
+            This record
+
+        Examples:
+            >>> content = slims.fetch_by_pk("Content", 1)
+                content.cntn_id.value = "new id"
+                content.cntn_fk_location.value = 3
+                content.save()
+
+            Changes the id and the location of the content record with primary key 1
+        """
+        changes = self.changes()
+        if not changes:
+            return self
+        updated = self.update(changes)
+        for name, value in list(self.__dict__.items()):
+            if isinstance(value, Column):
+                del self.__dict__[name]
+        self.json_entity = updated.json_entity
+        self.schema = updated.schema
+        self._followed = {}
+        self._json_columns = None
+        self._links = None
+        self._changed = None
+        return self
+
+    def changes(self) -> dict[str, Any]:
+        """
+        Returns:
+            The values of the columns changed since this record was fetched
+            (or last saved), by column name
+        """
+        if not self._changed:
+            return {}
+        return {name: self.column(name).value for name in self._changed}
+
+    def _mark_changed(self, column_name: str) -> None:
+        if self._changed is None:
+            self._changed = set()
+        self._changed.add(column_name)
 
     def remove(self) -> None:
         """
@@ -190,7 +682,7 @@ class Record(object):
         url = self.table_name() + "/" + str(self.pk())
         response = self.slims_api.delete(url=url)
         if response.status_code != 200:
-            raise _SlimsApiException("Delete failed: " + response.text)
+            raise _SlimsApiException("Delete failed: " + response.text, response.status_code)
 
     def table_name(self) -> str:
         """
@@ -245,6 +737,58 @@ class Record(object):
         location = response.headers['Location']
         return int(location[location.rfind("/") + 1:])
 
+    def add_attachment_from_file(self, name: str, source: Union[str, 'os.PathLike[str]', IO[bytes]],
+                                 chunk_size: int = 768 * 1024) -> int:
+        """Adds an attachment to a record (over HTTP) from a file, without
+        reading the whole file in memory.
+
+        The file is read and base64 encoded chunk_size bytes at a time while
+        it is being sent, so the memory used does not depend on its size.
+
+        Note:
+            When a RetryPolicy retries POST, only uploads from paths and
+            seekable files can be retried, other streams cannot be read again.
+
+        Args:
+            name (string): The name of the attachment
+            source (string or file): The path of the file, or a binary file
+                object to read it from
+            chunk_size (int, optional): The number of bytes read at a time,
+                rounded down to a multiple of 3. Defaults to 768 KiB
+
+        Returns:
+            The primary key of the added attachment
+
+        Examples:
+            >>> content.add_attachment_from_file("reads.fastq.gz", "/data/run42/reads.fastq.gz")
+
+            >>> with open(file_name, 'rb') as to_upload:
+                    content.add_attachment_from_file("test.txt", to_upload)
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file:
+                return self.add_attachment_from_file(name, file, chunk_size)
+
+        body = {
+            "attm_name": name,
+            "atln_recordPk": self.pk(),
+            "atln_recordTable": self.table_name(),
+        }
+        # The contents are appended as the last value of the object, whatever
+        # order and formatting the codec uses for the others
+        encoded = self.slims_api.codec.dumps(body).rstrip()
+        if not encoded.endswith(b"}"):
+            raise ValueError("The codec did not encode the upload as a json object")
+        prefix = encoded[:-1].rstrip() + b', "contents": "'
+        content = _Base64Body(prefix, b'"}', source, _remaining_size(source), max(3, chunk_size - chunk_size % 3))
+        response = self.slims_api._request("POST", self.slims_api.url + "repo",
+                                           data=content if content.size is not None else iter(content),
+                                           headers={"Content-Type": "application/json"})
+        if not response.ok:
+            raise _SlimsApiException("Upload failed: " + response.text, response.status_code)
+        location = response.headers['Location']
+        return int(location[location.rfind("/") + 1:])
+
     def column(self, column_name: str) -> Column:
         """
         Args:
@@ -258,7 +802,26 @@ class Record(object):
             >>> print(column.cntn_id.value)
 
         """
-        return self.__dict__[column_name]
+        column = self.__dict__.get(column_name)
+        if isinstance(column, Column):
+            return column
+        column = Column(self._json_column(column_name),
+                        self.schema.columns.get(column_name) if self.schema else None,
+                        self)
+        self.__dict__[column_name] = column
+        return column
+
+    def _json_column(self, column_name: str) -> dict[str, Any]:
+        json_columns = self.json_entity["columns"]
+        if self.schema is not None:
+            # Records of the same table nearly always list their columns in the same order
+            position = self.schema.positions.get(column_name)
+            if position is not None and position < len(json_columns) \
+                    and json_columns[position]["name"] == column_name:
+                return json_columns[position]
+        if self._json_columns is None:
+            self._json_columns = {json_column["name"]: json_column for json_column in json_columns}
+        return self._json_columns[column_name]
 
     def follow(self, link_name: str) -> Union[Optional['Record'], Sequence['Record']]:
         """
@@ -285,26 +848,95 @@ class Record(object):
             This fetches the content record with primary key 1 and then fetches
             its results (a list of records)
         """
-        for link in self.json_entity["links"]:
-            if link["rel"] == link_name:
-                href = link["href"]
-                entities = self.slims_api.get_entities(href)
-                if link_name.startswith("-"):
-                    return entities
-                else:
-                    if len(entities) > 0:
-                        return entities[0]
-                    else:
-                        return None
-        raise KeyError(str(link_name) + "not found in the list of links")
+        if link_name in self._followed:
+            return self._followed[link_name]
+        try:
+            href = self.links()[link_name]
+        except KeyError:
+            raise KeyError(str(link_name) + " not found in the list of links") from None
+        entities = self.slims_api.get_entities(href)
+        if link_name.startswith("-"):
+            return entities
+        else:
+            if len(entities) > 0:
+                return entities[0]
+            else:
+                return None
+
+    def links(self) -> dict[str, str]:
+        """
+        Returns:
+            The links of this record that can be followed, as a dict
+            from link name to url
+
+        Examples:
+            >>> "-rslt_fk_content" in content.links()
+        """
+        if self._links is None:
+            self._links = {link["rel"]: link["href"] for link in self.json_entity.get("links", [])}
+        return self._links
+
+
+class _Base64Body(object):
+    """ A json body containing a file as base64, encoded while it is being
+    sent. Its length is known (and sent as Content-Length) when the size of
+    the file is, it is sent with chunked encoding otherwise. """
+
+    def __init__(self, prefix: bytes, suffix: bytes, source: IO[bytes], size: Optional[int], chunk_size: int):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.source = source
+        self.size = size
+        self.chunk_size = chunk_size
+        # Seekable sources are read again from the same position when the
+        # body is sent again
+        self.start = source.tell() if size is not None else None
+
+    def __len__(self) -> int:
+        if self.size is None:
+            raise TypeError("the size of the file is not known")
+        return len(self.prefix) + 4 * ((self.size + 2) // 3) + len(self.suffix)
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self.start is not None:
+            self.source.seek(self.start)
+        yield self.prefix
+        remaining = self.size
+        pending = b""
+        while remaining is None or remaining > 0:
+            data = self.source.read(self.chunk_size if remaining is None else min(self.chunk_size, remaining))
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            if pending:
+                data = pending + data
+            # Base64 of consecutive multiples of 3 bytes concatenates into the
+            # base64 of the whole, short reads are carried over
+            cut = len(data) - len(data) % 3
+            pending = data[cut:]
+            if cut:
+                yield base64.b64encode(data[:cut] if pending else data)
+        yield base64.b64encode(pending) + self.suffix
+
+
+def _remaining_size(source: IO[bytes]) -> Optional[int]:
+    """ The number of bytes left in source, None when it cannot be known """
+    try:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END) - position
+        source.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
 
 
 class Attachment(Record):
     """ An extension of the Record class. Returned when the table of the
     record is Attachment."""
 
-    def __init__(self, json_entity: dict[str, Any], slims_api: _SlimsApi):
-        super().__init__(json_entity, slims_api)
+    def __init__(self, json_entity: dict[str, Any], slims_api: _SlimsApi, schema: _TableSchema = None):
+        super().__init__(json_entity, slims_api, schema)
 
     def get_local_path(self) -> str:
         """
@@ -318,16 +950,271 @@ class Attachment(Record):
         else:
             raise RuntimeError("no repo_location configured")
 
-    def download_to(self, location: str) -> None:
+    def open(self) -> io.BufferedReader:
+        """
+        Opens an attachment for reading
+
+        The file is read from the file repository when slims is defined with a
+        repo_location that has it, and streamed from slims otherwise.
+
+        Returns:
+            A binary file object, close it when done
+
+        Examples:
+            >>> with attachment.open() as file:
+                    header = file.read(4)
+        """
+        path = self._local_path()
+        if path is not None:
+            return open(path, 'rb')
+        response = self.slims_api.get("repo/" + str(self.pk()), stream=True, headers={"Accept-Encoding": "identity"})
+        if response.status_code != 200:
+            response.close()
+            raise _SlimsApiException("Download failed: " + response.text, response.status_code)
+        response.raw.decode_content = True
+        # The reader closes the response, not the end of its content
+        response.raw.auto_close = False
+        return io.BufferedReader(response.raw, _STREAM_CHUNK_SIZE)
+
+    def as_buffer(self) -> Union[mmap.mmap, '_EmptyBuffer']:
+        """
+        Maps the content of an attachment in memory
+
+        When the file is in the file repository (see open) it is memory-mapped
+        as is, nothing is read until it is used. Otherwise it is downloaded to
+        a temporary file first, which is mapped instead of holding the content
+        in memory.
+
+        Returns:
+            A read-only mmap (an empty bytes-like object for an empty file, as
+            those cannot be mapped), supporting len, slicing, find and the
+            buffer protocol (memoryview, numpy.frombuffer, ...). Close it, or
+            use it in a with statement
+
+        Examples:
+            >>> with attachment.as_buffer() as buffer:
+                    first_read = buffer.find(b"\\n@")
+        """
+        path = self._local_path()
+        if path is not None:
+            with open(path, 'rb') as file:
+                return _map(file)
+        with tempfile.TemporaryFile() as temporary, self.open() as source:
+            shutil.copyfileobj(source, temporary, 1024 * 1024)
+            temporary.flush()
+            return _map(temporary)
+
+    def _local_path(self) -> Optional[str]:
+        if not self.slims_api.repo_location:
+            return None
+        path = self.get_local_path()
+        return path if os.path.isfile(path) else None
+
+    def download_to(self, location: str, chunk_size: int = 1024 * 1024,
+                    progress: Callable[[int, Optional[int]], Any] = None,
+                    resume: bool = True, retries: int = 3,
+                    expected_hash: str = None, hash_algorithm: str = "sha256") -> None:
         """
         Downloads an attachment to a file on disk
 
+        The file is streamed to disk chunk_size bytes at a time, so the memory
+        used does not depend on its size. It is written next to location (with
+        a ".part" suffix) and only moved to location once it is complete and
+        has the expected size (and hash).
+
+        When the connection drops, the download continues after the last chunk
+        written (using a Range request) instead of starting over, up to
+        retries times.
+        A download that still fails keeps its ".part" file, so calling
+        download_to again continues it as well. Servers that do not support
+        ranges send the whole file again.
+
+        A download is only continued when the file did not change in the
+        meantime: the ETag (or Last-Modified date) slims sent is kept next to
+        the ".part" file (with a ".part.etag" suffix) and sent back in an
+        If-Range header. A ".part" file without it is downloaded again from
+        the start, unless expected_hash is given to check the result.
+
         Args:
             location(string): The path on disk to download the file to
+            chunk_size (int, optional): The number of bytes read and written
+                at a time. Defaults to 1 MiB
+            progress (callable, optional): Called after every chunk with the
+                number of bytes downloaded so far and the size of the file
+                (None when slims did not send it)
+            resume (bool, optional): Whether to continue a partial download
+                instead of starting over. Defaults to True
+            retries (int, optional): How many times a download failing with a
+                transient error (like a dropped connection) is tried again.
+                Defaults to 3. Ignored when slims has a retry_policy, which
+                is used instead
+            expected_hash (string, optional): The hex digest the file must have
+            hash_algorithm (string, optional): The hashlib algorithm of
+                expected_hash. Defaults to "sha256"
 
         Examples:
             >>> attachment.download_to("test.txt")
+            >>> attachment.download_to("reads.fastq.gz",
+                                       progress=lambda done, total: print(done, "/", total),
+                                       expected_hash="9f86d081884c7d65...")
         """
-        with open(location, 'wb') as destination:
-            response = self.slims_api.get("repo/" + str(self.pk()))
-            destination.write(response.content)
+        part = location + ".part"
+        validator_file = part + ".etag"
+        digest: Any = None
+        # Calls failing outright are tried again by the policy of slims already
+        policy = self.slims_api.retry_policy
+        retried_calls = policy is not None
+        if policy is None:
+            policy = RetryPolicy(max_attempts=retries + 1, jitter=0)
+        failures = 0
+        while True:
+            if os.path.exists(part) and not resume:
+                _discard(part, validator_file)
+            # Only resume from the same version of the file
+            validator = _read_validator(validator_file)
+            if os.path.exists(part) and validator is None and expected_hash is None:
+                _discard(part, validator_file)
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            if expected_hash is not None and digest is None:
+                digest = _hash_file(part, hash_algorithm, chunk_size)
+            # Sizes and ranges are counted in bytes of the file, not of a
+            # compressed version of it
+            headers = {"Accept-Encoding": "identity"}
+            if offset:
+                headers["Range"] = "bytes=" + str(offset) + "-"
+                if validator is not None:
+                    headers["If-Range"] = validator
+
+            response = None
+            receiving = False
+            try:
+                response = self.slims_api.get("repo/" + str(self.pk()), stream=True, headers=headers)
+                if response.status_code == 416 and offset:
+                    # The part is complete already, or does not belong to this file
+                    if _content_range(response.headers.get("Content-Range", ""))[1] == offset:
+                        total: Optional[int] = offset
+                        break
+                    _discard(part, validator_file)
+                    digest = None
+                    continue
+                if response.status_code == 206 and offset:
+                    start, total = _content_range(response.headers.get("Content-Range", ""))
+                    if start != offset:
+                        raise _SlimsApiException("Download failed: slims resumed at byte " + str(start) +
+                                                 " instead of " + str(offset))
+                elif response.status_code == 200:
+                    offset = 0
+                    total = int(response.headers["Content-Length"]) if "Content-Length" in response.headers else None
+                    if response.headers.get("Content-Encoding", "identity") != "identity":
+                        # Compressed anyway, the length is not the size of the file
+                        total = None
+                    if digest is not None:
+                        digest = hashlib.new(hash_algorithm)
+                    # A new download, of what may be a new version of the file
+                    validator = response.headers.get("ETag", response.headers.get("Last-Modified"))
+                    if validator is not None:
+                        with open(validator_file, 'w') as file:
+                            file.write(validator)
+                    elif os.path.exists(validator_file):
+                        os.remove(validator_file)
+                else:
+                    raise _SlimsApiException("Download failed: " + response.text, response.status_code)
+
+                receiving = True
+                done = offset
+                with open(part, 'ab' if offset else 'wb') as destination:
+                    try:
+                        for chunk in response.iter_content(chunk_size):
+                            destination.write(chunk)
+                            if digest is not None:
+                                digest.update(chunk)
+                            done += len(chunk)
+                            if progress is not None:
+                                progress(done, total)
+                    finally:
+                        destination.flush()
+                        os.fsync(destination.fileno())
+                if total is not None and done < total:
+                    raise requests.exceptions.ChunkedEncodingError(
+                        "Connection closed after " + str(done) + " of " + str(total) + " bytes")
+                break
+            except BaseException as e:
+                failures += 1
+                wait = None
+                if isinstance(e, Exception) and (receiving or not retried_calls):
+                    wait = policy.retry_failure(e, failures)
+                if wait is None:
+                    if not resume:
+                        _discard(part, validator_file)
+                    raise
+                time.sleep(wait)
+            finally:
+                if response is not None:
+                    response.close()
+
+        size = os.path.getsize(part)
+        if total is not None and size != total:
+            _discard(part, validator_file)
+            raise _SlimsApiException("Download failed: got " + str(size) + " bytes instead of " + str(total))
+        if expected_hash is not None and digest.hexdigest() != expected_hash.lower():
+            _discard(part, validator_file)
+            raise _SlimsApiException("Download failed: the " + hash_algorithm + " hash is " + digest.hexdigest() +
+                                     " instead of " + expected_hash)
+        os.replace(part, location)
+        if os.path.exists(validator_file):
+            os.remove(validator_file)
+
+
+class _EmptyBuffer(bytes):
+    """ Stands in for the mmap of an empty file, which cannot be mapped """
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> '_EmptyBuffer':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def _map(file: IO[bytes]) -> Union[mmap.mmap, _EmptyBuffer]:
+    """ A read-only map of file, which stays valid after file is closed """
+    if os.fstat(file.fileno()).st_size == 0:
+        return _EmptyBuffer()
+    return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _read_validator(path: str) -> Optional[str]:
+    """ The ETag or Last-Modified date kept at path, None when there is none """
+    try:
+        with open(path) as file:
+            return file.read() or None
+    except FileNotFoundError:
+        return None
+
+
+def _discard(*paths: str) -> None:
+    """ Removes the files at paths that exist """
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _content_range(header: str) -> tuple[Optional[int], Optional[int]]:
+    """ The first byte and the size of the file of a Content-Range header """
+    match = re.match(r"bytes (?:(\d+)-\d+|\*)/(\d+|\*)", header)
+    if match is None:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start else None), (int(total) if total != "*" else None)
+
+
+def _hash_file(path: str, algorithm: str, chunk_size: int) -> Any:
+    """ The hashlib hash of the file at path, empty when it does not exist """
+    digest = hashlib.new(algorithm)
+    if os.path.exists(path):
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+    return digest
@@ -0,0 +1,64 @@
+import threading
+import time
+
+
+class RateLimiter(object):
+    """
+    A token bucket spacing out the calls made to slims
+
+    The bucket holds up to burst tokens and refills at rate tokens per
+    second. Every call takes a token, calls that find the bucket empty wait
+    for their turn, in the order they arrived. One limiter can be shared by
+    any number of threads.
+
+    Args:
+        rate (float): The sustained number of calls per second
+        burst (int, optional): The number of calls that can be made at once
+            after a quiet period. Defaults to 1, meaning the calls are evenly
+            spaced
+
+    Attributes:
+        calls (int): The number of calls that went through this limiter
+        delayed (int): The number of those calls that had to wait
+        waited (float): The total time calls waited, in seconds
+
+    Examples:
+        >>> slims = Slims("slims", "http://localhost:9999", "admin", "admin",
+                          rate_limiter=RateLimiter(20, burst=5))
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.calls = 0
+        self.delayed = 0
+        self.waited = 0.0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """ Takes a token, waiting until one is available
+
+        Returns:
+            The time waited, in seconds
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens are reserved up front, a negative balance is the queue of
+            # calls waiting for the bucket to refill
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.calls += 1
+            if wait > 0:
+                self.delayed += 1
+                self.waited += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
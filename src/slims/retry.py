@@ -0,0 +1,167 @@
+import logging
+import random
+import threading
+from typing import Collection, Optional
+
+import requests
+import urllib3
+
+logger = logging.getLogger('genohm.slims.retry')
+
+# Statuses slims (or a proxy in front of it) answers with when it is
+# temporarily unable to handle a request
+TRANSIENT_STATUS_CODES = frozenset([429, 502, 503, 504])
+
+
+class RetryPolicy(object):
+    """
+    Decides which failed calls to slims are tried again, and when
+
+    A call is tried again when slims answers with one of status_codes or when
+    the connection fails, as long as the call is safe to repeat: only calls
+    with one of methods are retried by default, because adding a record (PUT)
+    or uploading an attachment twice is not the same as doing it once. Calls
+    with any method are retried when the connection could not be made at all,
+    as slims never received them then.
+
+    The wait before the n-th retry is backoff * 2 ** (n - 1) seconds (at most
+    max_backoff), of which a random part (jitter) is left out so that clients
+    failing at the same time do not all retry at the same time. A Retry-After
+    header sent by slims takes precedence.
+
+    Args:
+        max_attempts (int, optional): The maximum number of times a call is
+            made, including the first one. Defaults to 3
+        backoff (float, optional): The wait before the first retry, in seconds.
+            Defaults to 0.5
+        max_backoff (float, optional): The longest wait between two attempts,
+            in seconds. Defaults to 30
+        jitter (float, optional): The part of the wait that is random, between
+            0 (none) and 1 (all of it). Defaults to 0.5
+        status_codes (collection, optional): The response statuses that are
+            retried. Defaults to 429, 502, 503 and 504
+        methods (collection, optional): The HTTP methods that are retried.
+            Defaults to GET and DELETE. Add POST to retry updates as well
+
+    Attributes:
+        attempts (int): The number of calls made under this policy
+        retries (int): The number of those calls that were retries
+        retries_by_reason (dict): The number of retries by status code or
+            exception name
+        exhausted (int): The number of calls that still failed after max_attempts
+
+    Examples:
+        >>> policy = RetryPolicy(max_attempts=5, methods=["GET", "DELETE", "POST"])
+            slims = Slims("slims", "http://localhost:9999", "admin", "admin",
+                          retry_policy=policy)
+            ...
+            print(policy.retries_by_reason)
+    """
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 backoff: float = 0.5,
+                 max_backoff: float = 30,
+                 jitter: float = 0.5,
+                 status_codes: Collection[int] = TRANSIENT_STATUS_CODES,
+                 methods: Collection[str] = ("GET", "DELETE")):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_codes = frozenset(status_codes)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.attempts = 0
+        self.retries = 0
+        self.retries_by_reason: dict[str, int] = {}
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def retry_response(self, method: str, response: requests.Response, attempt: int) -> Optional[float]:
+        """
+        Returns:
+            How long to wait before trying the call that got response again,
+            or None when it should not be tried again
+        """
+        if response.status_code not in self.status_codes or method.upper() not in self.methods:
+            return None
+        if not self._can_retry(attempt):
+            return None
+        self._count(str(response.status_code))
+        return self._retry_after(response) or self.wait(attempt)
+
+    def retry_error(self, method: str, error: requests.RequestException, attempt: int) -> Optional[float]:
+        """
+        Returns:
+            How long to wait before trying the call that raised error again,
+            or None when it should not be tried again
+        """
+        if not isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return None
+        if method.upper() not in self.methods and not _not_sent(error):
+            return None
+        if not self._can_retry(attempt):
+            return None
+        self._count(type(error).__name__)
+        return self.wait(attempt)
+
+    def retry_failure(self, error: Exception, attempt: int) -> Optional[float]:
+        """ Like retry_error, for operations that are safe to repeat as a
+        whole whatever calls they make (updating a row, downloading a file)
+
+        Returns:
+            How long to wait before trying the operation that raised error
+            again, or None when it should not be tried again
+        """
+        if not self.is_transient(error) or not self._can_retry(attempt):
+            return None
+        status_code = getattr(error, "status_code", None)
+        self._count(str(status_code) if status_code is not None else type(error).__name__)
+        return self.wait(attempt)
+
+    def is_transient(self, error: Exception) -> bool:
+        """ Whether error might not happen again when retried: a connection
+        that failed or was cut, a timeout, or an error from slims (a
+        _SlimsApiException) with one of status_codes """
+        if isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+            return True
+        return getattr(error, "status_code", None) in self.status_codes
+
+    def wait(self, attempt: int) -> float:
+        """
+        Returns:
+            The wait in seconds after the given (failed) attempt
+        """
+        wait = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return wait - wait * self.jitter * random.random()
+
+    def _can_retry(self, attempt: int) -> bool:
+        if attempt < self.max_attempts:
+            return True
+        with self._lock:
+            self.exhausted += 1
+        return False
+
+    def _count(self, reason: str) -> None:
+        with self._lock:
+            self.retries += 1
+            self.retries_by_reason[reason] = self.retries_by_reason.get(reason, 0) + 1
+        logger.info("Retrying call to slims after " + reason)
+
+    def _attempted(self) -> None:
+        with self._lock:
+            self.attempts += 1
+
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        try:
+            return min(self.max_backoff, float(response.headers["Retry-After"]))
+        except (KeyError, ValueError):
+            return None
+
+
+def _not_sent(error: requests.RequestException) -> bool:
+    """ Whether the request failed before reaching the server """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
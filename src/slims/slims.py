@@ -1,14 +1,25 @@
+import contextvars
 import logging
+import os
 import sched
 import threading
 import time
-from typing import Any, List, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Iterator, List, Optional, Sequence, Union
+from urllib.parse import urlsplit
 
 from flask import Flask, Response, jsonify
 from flask import request as flaskrequest
 
-from .criteria import Criterion
-from .internal import Record, _SlimsApi, _SlimsApiException
+from . import frame
+from .bulk import BulkResult, run_all
+from .cache import RecordCache
+from .codec import JsonCodec
+from .criteria import Criterion, is_one_of
+from .internal import Attachment, Record, _SlimsApi, _SlimsApiException
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
 from .step import Step
 
 app = Flask(__name__)
@@ -45,6 +56,25 @@ def _flask_thread(port: int) -> None:
     app.run(port=port, host='0.0.0.0')
 
 
+def _fetch_body(criteria: Optional[Criterion], sort: Optional[list[str]],
+                start: Optional[int], end: Optional[int]) -> dict[str, Any]:
+    body: dict[str, Any] = {
+        "sortBy": sort if sort is not None else [],
+        "startRow": start,
+        "endRow": end,
+    }
+    if criteria:
+        body["criteria"] = criteria.to_dict()
+    return body
+
+
+def _pk_field(record: Record) -> Optional[str]:
+    for json_column in record.json_entity["columns"]:
+        if json_column["name"].endswith("_pk"):
+            return json_column["name"]
+    return None
+
+
 class Slims(object):
     """
     Creates a new slims instance to work with
@@ -65,6 +95,22 @@ class Slims(object):
         local_port (int, optional): The port on which this python script is running
             Needed for ports. SLims will contact the python script on this
             ports. Defaults to "5000"
+        pool_size (int, optional): The number of keep-alive connections kept open
+            to slims. Raise this when many threads share this instance. Defaults to 10
+        json_codec (JsonCodec, optional): Encodes and decodes the json exchanged
+            with slims. Defaults to the standard library, pass an OrjsonCodec
+            to use orjson
+        retry_policy (RetryPolicy, optional): Tries calls that failed because
+            slims was temporarily unavailable again. Defaults to no retries
+        rate_limiter (RateLimiter, optional): Spaces out the calls made by all
+            the threads using this instance. Defaults to no limit
+        max_in_flight (int, optional): The maximum number of calls waiting for
+            slims to answer at the same time, other calls wait for one of them
+            to finish. Defaults to no limit
+        coalesce (bool, optional): Lets identical fetches made at the same
+            time by several threads share one call to slims. Defaults to True
+        cache (RecordCache, optional): Keeps fetched records in memory so
+            fetching them again does not call slims. Defaults to no cache
     """
 
     def __init__(self,
@@ -77,7 +123,14 @@ class Slims(object):
                  client_secret: str = None,
                  repo_location: str = None,
                  local_host: str = "localhost",
-                 local_port: int = 5000):
+                 local_port: int = 5000,
+                 pool_size: int = 10,
+                 json_codec: JsonCodec = None,
+                 retry_policy: RetryPolicy = None,
+                 rate_limiter: RateLimiter = None,
+                 max_in_flight: int = None,
+                 coalesce: bool = True,
+                 cache: RecordCache = None):
 
         slims_instances[name] = self
         self.local_host = local_host
@@ -85,7 +138,13 @@ class Slims(object):
         self.local_url = "http://" + self.local_host + \
             ":" + str(self.local_port) + "/"
         if username is not None and password is not None:
-            self.slims_api = _SlimsApi(url, username, password, repo_location)
+            self.slims_api = _SlimsApi(url, username, password, repo_location,
+                                       pool_size=pool_size, codec=json_codec,
+                                       retry_policy=retry_policy,
+                                       rate_limiter=rate_limiter,
+                                       max_in_flight=max_in_flight,
+                                       coalesce=coalesce,
+                                       cache=cache)
         elif oauth:
             self.slims_api = _SlimsApi(url,
                                        "OAUTH",
@@ -95,7 +154,14 @@ class Slims(object):
                                        self.token_updater,
                                        self.local_url + name + "/token",
                                        client_id=client_id,
-                                       client_secret=client_secret)
+                                       client_secret=client_secret,
+                                       pool_size=pool_size,
+                                       codec=json_codec,
+                                       retry_policy=retry_policy,
+                                       rate_limiter=rate_limiter,
+                                       max_in_flight=max_in_flight,
+                                       coalesce=coalesce,
+                                       cache=cache)
             self.token: Optional[dict[str, Any]] = None
         else:
             raise Exception(
@@ -113,7 +179,7 @@ class Slims(object):
         self.token = token
 
     def fetch(self, table: str, criteria: Criterion, sort: list[str] = None,
-              start: int = None, end: int = None) -> List[Record]:
+              start: int = None, end: int = None, columns: list[str] = None) -> List[Record]:
         """Fetch data by criteria
 
         The optional start and end parameters can be used to page the returned
@@ -125,6 +191,8 @@ class Slims(object):
             sort (list, optional): The fields to sort on
             start (int, optional):  The first row to return
             end (int, optional): The last row to return
+            columns (list, optional): The columns to keep on the returned records,
+                the others are dropped as soon as they are received. Defaults to all
 
         Returns:
             The list of matched records
@@ -146,25 +214,147 @@ class Slims(object):
 
             Fetches content records that have an id that starts with DNA. The
             returned list is sorted by cntn_barCode (descending).
+
+            >>> slims.fetch("Content",
+                            start_with("cntn_id", "DNA"),
+                            columns = ["cntn_id", "cntn_barCode"])
+
+            Fetches the same content records, but only with their id and barcode
+            columns.
         """
-        if sort is None:
-            sort = []
-        body: dict[str, Any] = {
-            "sortBy": sort,
-            "startRow": start,
-            "endRow": end,
-        }
-        if criteria:
-            body["criteria"] = criteria.to_dict()
-
-        return self.slims_api.get_entities(table + "/advanced", body=body)
-
-    def fetch_by_pk(self, table: str, pk: int) -> Optional[Record]:
+        return self.slims_api.get_entities(table + "/advanced", body=_fetch_body(criteria, sort, start, end),
+                                           columns=columns)
+
+    def fetch_iter(self, table: str, criteria: Criterion, sort: list[str] = None,
+                   page_size: int = 1000, prefetch: int = 0, columns: list[str] = None) -> Iterator[Record]:
+        """Fetch data by criteria, one page at a time
+
+        Works like fetch, but instead of returning all the matched records at
+        once it requests them in pages of page_size records and yields them as
+        they come in. Without prefetching, every record is yielded as soon as
+        it has been received, and at most one page is held in memory at a time.
+
+        Args:
+            table (str): The table to fetch from
+            criteria (criteria): The criteria to match
+            sort (list, optional): The fields to sort on. Sort on a unique field
+                to get a stable order over the pages
+            page_size (int, optional): The number of records fetched per request
+            prefetch (int, optional): The number of page requests kept in flight
+                on background threads while the current page is consumed.
+                Pages are still yielded in order. Defaults to 0 (no prefetching)
+            columns (list, optional): The columns to keep on the returned records,
+                see fetch. Defaults to all
+
+        Returns:
+            An iterator over the matched records
+
+        Examples:
+            >>> for content in slims.fetch_iter("Content",
+                                                start_with("cntn_id", "DNA"),
+                                                sort=["cntn_pk"]):
+                    print(content.cntn_id.value)
+
+            Goes over all the content records that have an id that starts
+            with DNA, fetching 1000 of them at a time.
+
+            >>> for content in slims.fetch_iter("Content", None, sort=["cntn_pk"],
+                                                prefetch=4):
+                    export(content)
+
+            Exports all content records while the next 4 pages are being
+            downloaded in the background.
+        """
+        if prefetch > 0:
+            yield from self._fetch_iter_prefetched(table, criteria, sort, page_size, prefetch, columns)
+            return
+        start = 0
+        while True:
+            received = 0
+            for record in self.slims_api.iter_entities(table + "/advanced",
+                                                       body=_fetch_body(criteria, sort, start, start + page_size),
+                                                       columns=columns):
+                received += 1
+                yield record
+            if received < page_size:
+                return
+            start += page_size
+
+    def _fetch_iter_prefetched(self, table: str, criteria: Criterion, sort: Optional[list[str]],
+                               page_size: int, prefetch: int, columns: Optional[list[str]]) -> Iterator[Record]:
+        executor = ThreadPoolExecutor(max_workers=prefetch)
+        pending: deque[Future] = deque()
+        next_start = 0
+
+        def submit() -> None:
+            nonlocal next_start
+            # The requested-for user lives in a context variable, copy it over to the worker
+            context = contextvars.copy_context()
+            pending.append(executor.submit(context.run, self.fetch, table, criteria, sort,
+                                           next_start, next_start + page_size, columns))
+            next_start += page_size
+
+        try:
+            for _ in range(prefetch):
+                submit()
+            while True:
+                page = pending.popleft().result()
+                if len(page) < page_size:
+                    yield from page
+                    return
+                submit()
+                yield from page
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def fetch_frame(self, table: str, criteria: Criterion, columns: list[str] = None,
+                    sort: list[str] = None, start: int = None, end: int = None,
+                    arrow: bool = False) -> Any:
+        """Fetch data by criteria into a pandas DataFrame (or an Arrow table)
+
+        The returned data is decoded column by column, no Record is created.
+        There is one row per matched record and one column per slims column
+        (plus a "pk" column). DATE columns become datetime64 values, QUANTITY
+        columns get an extra "<name>_unit" column and FOREIGN_KEY columns hold
+        the primary key of the linked record with an extra "<name>_display"
+        column for its display value.
+
+        Note:
+            Requires pandas (or pyarrow when arrow is True)
+
+        Args:
+            table (str): The table to fetch from
+            criteria (criteria): The criteria to match
+            columns (list, optional): The columns to return, defaults to all of them
+            sort (list, optional): The fields to sort on
+            start (int, optional):  The first row to return
+            end (int, optional): The last row to return
+            arrow (bool, optional): Return a pyarrow Table instead of a pandas DataFrame
+
+        Returns:
+            A pandas DataFrame, or a pyarrow Table when arrow is True
+
+        Examples:
+            >>> frame = slims.fetch_frame("Result",
+                                          equals("rslt_fk_test", 2),
+                                          columns=["rslt_fk_content", "rslt_value"])
+                frame.plot(x="rslt_fk_content_display", y="rslt_value")
+        """
+        entities = self.slims_api.get_json_entities(table + "/advanced", body=_fetch_body(criteria, sort, start, end),
+                                                    columns=columns)
+        if arrow:
+            return frame.to_arrow(entities, columns)
+        else:
+            return frame.to_pandas(entities, columns)
+
+    def fetch_by_pk(self, table: str, pk: int, columns: list[str] = None) -> Optional[Record]:
         """ Fetch a record by primary key
 
         Args:
             table (string): The table of the record
             pk (int): The primary key of the record
+            columns (list, optional): The columns to keep on the returned record,
+                see fetch. Defaults to all
 
         Returns:
             A single record (or None)
@@ -172,12 +362,107 @@ class Slims(object):
         Examples:
             >>> slims.fetch_by_pk("Content", 1)
         """
-        entities = self.slims_api.get_entities(table + "/" + str(pk))
+        entities = self.slims_api.get_entities(table + "/" + str(pk), columns=columns)
         if len(entities) > 0:
             return entities[0]
         else:
             return None
 
+    def follow_many(self, records: Sequence[Record], link_name: str,
+                    chunk_size: int = 500) -> List[Union[Optional[Record], List[Record]]]:
+        """ Follows the same foreign key for many records at once
+
+        Instead of one request per record (like calling follow on each of
+        them) the linked records are fetched with a few is_one_of queries of
+        at most chunk_size primary keys each. The result is also stored on
+        each record, so calling follow(link_name) on them afterwards does not
+        contact slims anymore.
+
+        Args:
+            records (list): The records to follow the link of
+            link_name(string): field linking two tables.
+                The links should start with a - (minus) if the link is incoming.
+            chunk_size (int, optional): The maximum number of keys per query
+
+        Returns:
+            For every record in records (in the same order), what follow would
+            have returned: one record (or None) when the link is outgoing and a
+            list of records when the link is incoming. Records that do not have
+            the link get None.
+
+        Examples:
+            >>> results = slims.fetch("Result", None)
+                slims.follow_many(results, "rslt_fk_experimentRunStep")
+                for result in results:
+                    print(result.follow("rslt_fk_experimentRunStep"))
+
+            Fetches all the results and their experiment run steps in a
+            handful of requests.
+        """
+        if link_name.startswith("-"):
+            followed = self._follow_many_incoming(records, link_name, chunk_size)
+        else:
+            followed = self._follow_many_outgoing(records, link_name, chunk_size)
+        for record, linked in zip(records, followed):
+            if linked is not None:
+                record._followed[link_name] = linked
+        return followed
+
+    def _follow_many_outgoing(self, records: Sequence[Record], link_name: str,
+                              chunk_size: int) -> List[Union[Optional[Record], List[Record]]]:
+        targets: List[Optional[tuple[str, int]]] = []
+        for record in records:
+            href = record.links().get(link_name)
+            if href is None:
+                targets.append(None)
+            else:
+                path = urlsplit(href).path.rstrip("/").split("/")
+                targets.append((path[-2], int(path[-1])))
+
+        by_table: dict[str, dict[int, Optional[Record]]] = {}
+        for target in targets:
+            if target is not None:
+                by_table.setdefault(target[0], {})[target[1]] = None
+        for table, by_pk in by_table.items():
+            pks = list(by_pk)
+            # The name of the primary key field is not known up front, it is
+            # taken from the first linked record
+            first = self.fetch_by_pk(table, pks[0])
+            by_pk[pks[0]] = first
+            pk_field = _pk_field(first) if first is not None else None
+            for start in range(1, len(pks), chunk_size):
+                chunk = pks[start:start + chunk_size]
+                if pk_field is None:
+                    for pk in chunk:
+                        by_pk[pk] = self.fetch_by_pk(table, pk)
+                else:
+                    for linked in self.fetch(table, is_one_of(pk_field, chunk)):
+                        by_pk[linked.pk()] = linked
+
+        return [by_table[target[0]][target[1]] if target is not None else None
+                for target in targets]
+
+    def _follow_many_incoming(self, records: Sequence[Record], link_name: str,
+                              chunk_size: int) -> List[Union[Optional[Record], List[Record]]]:
+        table = None
+        field = link_name[1:]
+        for record in records:
+            href = record.links().get(link_name)
+            if href is not None:
+                table = urlsplit(href).path.rstrip("/").split("/")[-1]
+                break
+        if table is None:
+            return [None for record in records]
+
+        pks = list({record.pk() for record in records})
+        by_pk: dict[int, List[Record]] = {pk: [] for pk in pks}
+        for start in range(0, len(pks), chunk_size):
+            for linked in self.fetch(table, is_one_of(field, pks[start:start + chunk_size])):
+                by_pk[linked.column(field).value].append(linked)
+
+        return [by_pk[record.pk()] if link_name in record.links() else None
+                for record in records]
+
     def add(self, table: str, values: dict[str, Any]) -> Record:
         """ Add a new record in slims
 
@@ -200,9 +485,231 @@ class Slims(object):
         """
         response = self.slims_api.put(url=table, body=values)
         if response.status_code != 200:
-            raise _SlimsApiException("Add failed: " + response.text)
-        new_values = response.json()["entities"][0]
-        return Record(new_values, self.slims_api)
+            raise _SlimsApiException("Add failed: " + response.text, response.status_code)
+        new_values = self.slims_api.decode(response)["entities"][0]
+        return self.slims_api.record(new_values)
+
+    def add_many(self, table: str, rows: Sequence[dict[str, Any]], batch_size: int = 100,
+                 max_workers: int = 8) -> BulkResult:
+        """ Add many new records in slims
+
+        The records are added concurrently by max_workers threads, batch_size
+        of them at a time. A record that cannot be added does not stop the
+        others.
+
+        Note:
+            Keep max_workers at most the pool_size of this instance, extra
+            connections are not kept alive.
+
+        Args:
+            table (string): Table where the records need to be added.
+            rows (list): The values of the new records
+            batch_size (int, optional): The number of records handed to the
+                workers at a time. Defaults to 100
+            max_workers (int, optional): The number of records added at the
+                same time. Defaults to 8
+
+        Returns:
+            A BulkResult with the added records in the order of rows (None for
+            the ones that failed) and the errors by index in rows
+
+        Examples:
+            >>> result = slims.add_many("Content", [
+                    {"cntn_id": "DNA" + str(i), "cntn_fk_contentType": 1}
+                    for i in range(5000)])
+                result.raise_for_errors()
+                added = result.results
+        """
+        return run_all(self.add, [(table, values) for values in rows], batch_size, max_workers)
+
+    def update_many(self, records_or_pks: Sequence[Union[Record, int]], values: dict[str, Any],
+                    table: str = None, batch_size: int = 100, max_workers: int = 8,
+                    retries: int = 2) -> BulkResult:
+        """ Updates many records with the same values
+
+        The records are updated concurrently by max_workers threads, batch_size
+        of them at a time. Updates failing because slims or the network is
+        temporarily unavailable (status 429, 502, 503, 504, connection errors
+        and timeouts) are tried again; other failures do not stop the others.
+
+        Args:
+            records_or_pks (list): The records to update, or their primary keys
+            values (dict): Values to update
+            table (string, optional): The table of the records, needed when
+                primary keys are given
+            batch_size (int, optional): The number of records handed to the
+                workers at a time. Defaults to 100
+            max_workers (int, optional): The number of records updated at the
+                same time. Defaults to 8
+            retries (int, optional): How many times an update failing with a
+                transient error is tried again. Defaults to 2. Ignored when the
+                retry_policy of this instance retries POST calls, which is
+                used instead
+
+        Returns:
+            A BulkResult with the updated records in the order of
+            records_or_pks (None for the ones that failed), the errors by index
+            and throughput metrics
+
+        Examples:
+            >>> pending = slims.fetch("Content", equals("cntn_fk_status", 1))
+                result = slims.update_many(pending, {"cntn_fk_status": 2})
+                print(result)
+
+            Moves all the pending contents to another status
+        """
+        records = [self._as_record(record_or_pk, table) for record_or_pk in records_or_pks]
+        return run_all(Record.update, [(record, values) for record in records], batch_size, max_workers,
+                       self._bulk_retry_policy(retries, "POST"))
+
+    def remove_many(self, records_or_pks: Sequence[Union[Record, int]], table: str = None,
+                    batch_size: int = 100, max_workers: int = 8, retries: int = 2) -> BulkResult:
+        """ Removes many records
+
+        Works like update_many.
+
+        Args:
+            records_or_pks (list): The records to remove, or their primary keys
+            table (string, optional): The table of the records, needed when
+                primary keys are given
+            batch_size (int, optional): The number of records handed to the
+                workers at a time. Defaults to 100
+            max_workers (int, optional): The number of records removed at the
+                same time. Defaults to 8
+            retries (int, optional): How many times a removal failing with a
+                transient error is tried again. Defaults to 2. Ignored when the
+                retry_policy of this instance retries DELETE calls, which is
+                used instead
+
+        Returns:
+            A BulkResult with the primary keys of the removed records in the
+            order of records_or_pks (None for the ones that failed), the errors
+            by index and throughput metrics
+
+        Examples:
+            >>> slims.remove_many([1, 2, 3], table="Content").raise_for_errors()
+        """
+        def remove(record: Record) -> int:
+            record.remove()
+            return record.pk()
+
+        records = [self._as_record(record_or_pk, table) for record_or_pk in records_or_pks]
+        return run_all(remove, [(record,) for record in records], batch_size, max_workers,
+                       self._bulk_retry_policy(retries, "DELETE"))
+
+    def download_attachments(self, records_or_pks: Sequence[Union[Record, int]], directory: str,
+                             batch_size: int = 100, max_workers: int = 8, retries: int = 2,
+                             chunk_size: int = 1024 * 1024) -> BulkResult:
+        """ Downloads many attachments to a directory
+
+        The attachments are downloaded concurrently by max_workers threads,
+        batch_size of them at a time, each one like Attachment.download_to.
+        An attachment that cannot be downloaded does not stop the others.
+
+        Every attachment is saved under its name. When several attachments
+        have the same name, all but the first are prefixed with their primary
+        key ("<pk>_<name>", repeated until the name is free).
+
+        Note:
+            Keep max_workers at most the pool_size of this instance, extra
+            connections are not kept alive.
+
+        Args:
+            records_or_pks (list): Attachments, primary keys of attachments,
+                or other records, whose attachments are all downloaded
+            directory (string): The directory to download to, created when
+                it does not exist
+            batch_size (int, optional): The number of attachments handed to
+                the workers at a time. Defaults to 100
+            max_workers (int, optional): The number of attachments downloaded
+                at the same time. Defaults to 8
+            retries (int, optional): How many times a download failing with a
+                transient error is tried again. Defaults to 2. Ignored when the
+                retry_policy of this instance retries GET calls, which is
+                used instead
+            chunk_size (int, optional): The number of bytes read and written
+                at a time. Defaults to 1 MiB
+
+        Returns:
+            A BulkResult with the path of every downloaded file (None for the
+            ones that failed), the errors by index and throughput metrics.
+            There is one result per attachment, in the order of
+            records_or_pks (the attachments of a record in the order slims
+            returns them)
+
+        Examples:
+            >>> experiment_runs = slims.fetch("ExperimentRun", None)
+                result = slims.download_attachments(experiment_runs, "/data/runs")
+                print(result.transferred, "bytes at", result.transfer_rate, "bytes/s")
+        """
+        attachments = self._attachments_of(records_or_pks, max_workers)
+        os.makedirs(directory, exist_ok=True)
+
+        taken: set[str] = set()
+        locations = []
+        for attachment in attachments:
+            name = os.path.basename(attachment.column("attm_name").value or "") or str(attachment.pk())
+            prefix = str(attachment.pk()) + "_"
+            while name in taken:
+                name = prefix + name
+            taken.add(name)
+            locations.append(os.path.join(directory, name))
+
+        def download(attachment: Attachment, location: str) -> str:
+            # A download tried again resumes where the previous attempt stopped
+            attachment.download_to(location, chunk_size, retries=0)
+            return location
+
+        result = run_all(download, list(zip(attachments, locations)), batch_size, max_workers,
+                         self._bulk_retry_policy(retries, "GET"))
+        result.transferred = sum(os.path.getsize(location) for location in result.results if location is not None)
+        return result
+
+    def _bulk_retry_policy(self, retries: int, method: str) -> Optional[RetryPolicy]:
+        """ The policy rows failing with a transient error are tried again
+        with, None when their calls (with method) are already retried by the
+        retry_policy of this instance """
+        policy = self.slims_api.retry_policy
+        if retries <= 0 or (policy is not None and method in policy.methods):
+            return None
+        return RetryPolicy(max_attempts=retries + 1, jitter=0)
+
+    def _attachments_of(self, records_or_pks: Sequence[Union[Record, int]], max_workers: int) -> List[Attachment]:
+        pks = [record_or_pk for record_or_pk in records_or_pks if not isinstance(record_or_pk, Record)]
+        by_pk: dict[int, Attachment] = {}
+        for start in range(0, len(pks), 500):
+            for attachment in self.fetch("Attachment", is_one_of("attm_pk", pks[start:start + 500])):
+                if isinstance(attachment, Attachment):
+                    by_pk[attachment.pk()] = attachment
+        missing = [pk for pk in pks if pk not in by_pk]
+        if missing:
+            raise KeyError("Attachments " + ", ".join(map(str, missing)) + " not found")
+
+        owners = [record for record in records_or_pks
+                  if isinstance(record, Record) and not isinstance(record, Attachment)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # The requested-for user lives in a context variable, copy it over to the workers
+            futures = [(id(record), executor.submit(contextvars.copy_context().run, record.attachments))
+                       for record in owners]
+            owned = {key: future.result() for key, future in futures}
+
+        attachments: List[Attachment] = []
+        for record_or_pk in records_or_pks:
+            if isinstance(record_or_pk, Attachment):
+                attachments.append(record_or_pk)
+            elif isinstance(record_or_pk, Record):
+                attachments.extend(attachment for attachment in owned[id(record_or_pk)]
+                                   if isinstance(attachment, Attachment))
+            else:
+                attachments.append(by_pk[record_or_pk])
+        return attachments
+
+    def _as_record(self, record_or_pk: Union[Record, int], table: Optional[str]) -> Record:
+        if isinstance(record_or_pk, Record):
+            return record_or_pk
+        if table is None:
+            raise ValueError("table is required when primary keys are given")
+        return Record({"pk": record_or_pk, "tableName": table, "columns": []}, self.slims_api)
 
     def add_flow(self, flow_id: str, name: str, usage: str, steps: list[Step],
                  testing: bool = False, last_flow: bool = True) -> None:
@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import unittest
+
+import httpx
+
+from slims.aio import AsyncSlims
+from slims.criteria import equals
+from slims.internal import Attachment, Record
+
+
+class Test_Async(unittest.IsolatedAsyncioTestCase):
+
+    def slims_with(self, handler):
+        slims = AsyncSlims("http://localhost:9999", "admin", "admin")
+        slims.client = httpx.AsyncClient(transport=httpx.MockTransport(handler), auth=("admin", "admin"))
+        return slims
+
+    async def test_fetch(self):
+        def handler(request):
+            self.assertEqual("GET", request.method)
+            self.assertEqual("http://localhost:9999/rest/Content/advanced", str(request.url))
+            body = json.loads(request.content.decode('utf-8'))
+            self.assertEqual(body["criteria"]["fieldName"], "cntn_id")
+            self.assertEqual(body["sortBy"], ["cntn_createdOn"])
+            return httpx.Response(200, json={"entities": [{
+                "pk": 1,
+                "tableName": "Content",
+                "columns": [{"name": "cntn_id", "value": "sample1"}]}]})
+
+        async with self.slims_with(handler) as slims:
+            records = await slims.fetch("Content", equals("cntn_id", "sample1"), sort=["cntn_createdOn"])
+        self.assertIsInstance(records[0], Record)
+        self.assertEqual("sample1", records[0].cntn_id.value)
+
+    async def test_fetch_by_pk_nothing_returned(self):
+        def handler(request):
+            return httpx.Response(200, json={"entities": []})
+
+        async with self.slims_with(handler) as slims:
+            self.assertIsNone(await slims.fetch_by_pk("Content", 1))
+
+    async def test_add_update_remove(self):
+        def handler(request):
+            if request.method == "DELETE":
+                return httpx.Response(400, text="Could not delete")
+            return httpx.Response(200, json={"entities": [{
+                "pk": 1,
+                "tableName": "Content",
+                "columns": [{"name": "cntn_id", "value": json.loads(request.content)["cntn_id"]}]}]})
+
+        async with self.slims_with(handler) as slims:
+            added = await slims.add("Content", {"cntn_id": "foo"})
+            updated = await slims.update(added, {"cntn_id": "bar"})
+            self.assertEqual("bar", updated.cntn_id.value)
+            with self.assertRaises(Exception):
+                await slims.remove(updated)
+
+    async def test_follow(self):
+        def handler(request):
+            return httpx.Response(200, json={"entities": [{
+                "pk": 2,
+                "tableName": "ContentType",
+                "columns": []}]})
+
+        record = Record({"pk": 1,
+                         "tableName": "Content",
+                         "columns": [],
+                         "links": [{"rel": "cntn_fk_contentType",
+                                    "href": "http://localhost:9999/rest/ContentType/2"}]},
+                        None)
+        async with self.slims_with(handler) as slims:
+            self.assertEqual(2, (await slims.follow(record, "cntn_fk_contentType")).pk())
+            with self.assertRaises(KeyError):
+                await slims.follow(record, "unknown")
+
+    async def test_download_attachment(self):
+        def handler(request):
+            self.assertEqual("http://localhost:9999/rest/repo/1", str(request.url))
+            return httpx.Response(200, content=b"blabla")
+
+        async with self.slims_with(handler) as slims:
+            attachment = Attachment({"pk": 1, "tableName": "Attachment", "columns": []}, slims.slims_api)
+            temp = tempfile.NamedTemporaryFile(delete=False)
+            temp.close()
+            await slims.download_to(attachment, temp.name)
+        with open(temp.name, 'rb') as file:
+            self.assertEqual(b"blabla", file.read())
+        os.remove(temp.name)
@@ -1,11 +1,22 @@
+import base64
+import gzip
+import hashlib
+import io
 import json
 import os
+import socket
 import tempfile
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
+import requests
 import responses
 
-from slims.internal import Attachment, Record
+from slims.codec import JsonCodec
+from slims.internal import Attachment, Record, _Base64Body, _SlimsApiException
+from slims.retry import RetryPolicy
 from slims.slims import Slims
 
 
@@ -57,6 +68,97 @@ class Test_Attachments(unittest.TestCase):
         content = Record(self.contentValues, slims.slims_api)
         self.assertEqual(2, content.add_attachment("test.txt", b"Some text"))
 
+    @responses.activate
+    def test_add_attachment_from_file(self):
+        data = os.urandom(100000)
+        bodies = []
+
+        def add_attachment_callback(request):
+            bodies.append((b"".join(request.body), request.headers))
+            return (201, {"Location": "http://localhost:9999/rest/Attachment/" + str(len(bodies) + 1)}, "")
+
+        responses.add_callback(responses.POST, 'http://localhost:9999/rest/repo',
+                               callback=add_attachment_callback, content_type='application/json')
+
+        class Trickle(io.RawIOBase):
+            """ A stream that cannot seek and returns at most 1000 bytes per read """
+            def __init__(self):
+                self.position = 0
+
+            def readable(self):
+                return True
+
+            def readinto(self, buffer):
+                size = min(len(buffer), 1000, len(data) - self.position)
+                buffer[:size] = data[self.position:self.position + size]
+                self.position += size
+                return size
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        content = Record(self.contentValues, slims.slims_api)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "reads.fastq")
+            with open(path, 'wb') as file:
+                file.write(data)
+            self.assertEqual(2, content.add_attachment_from_file("reads.fastq", path, chunk_size=4096))
+        self.assertEqual(3, content.add_attachment_from_file("reads.fastq", Trickle(), chunk_size=4096))
+
+        for body, headers in bodies:
+            self.assertDictEqual(
+                {"atln_recordPk": 1,
+                 "atln_recordTable": "Content",
+                 "attm_name": "reads.fastq",
+                 "contents": base64.b64encode(data).decode("ascii")},
+                json.loads(body))
+        self.assertEqual(str(len(bodies[0][0])), bodies[0][1]["Content-Length"])
+        self.assertEqual("chunked", bodies[1][1]["Transfer-Encoding"])
+
+    @responses.activate
+    def test_add_attachment_from_file_with_codec(self):
+        class PrettyCodec(JsonCodec):
+            """ Sorts the keys, so contents would not come last, and indents """
+            def dumps(self, value):
+                return (json.dumps(value, sort_keys=True, indent=2) + "\n").encode("utf-8")
+
+        bodies = []
+
+        def add_attachment_callback(request):
+            bodies.append(b"".join(request.body))
+            return (201, {"Location": "http://localhost:9999/rest/Attachment/2"}, "")
+
+        responses.add_callback(responses.POST, 'http://localhost:9999/rest/repo',
+                               callback=add_attachment_callback, content_type='application/json')
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", json_codec=PrettyCodec())
+        content = Record(self.contentValues, slims.slims_api)
+        content.add_attachment_from_file("test.txt", io.BytesIO(b"abcd"))
+
+        self.assertDictEqual(
+            {"atln_recordPk": 1,
+             "atln_recordTable": "Content",
+             "attm_name": "test.txt",
+             "contents": base64.b64encode(b"abcd").decode("ascii")},
+            json.loads(bodies[0]))
+
+    @responses.activate
+    def test_add_attachment_from_file_failure(self):
+        responses.add(responses.POST, 'http://localhost:9999/rest/repo', body="Too large", status=413)
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        content = Record(self.contentValues, slims.slims_api)
+        self.assertRaises(_SlimsApiException, content.add_attachment_from_file, "test.txt", io.BytesIO(b"abc"))
+
+    def test_base64_body(self):
+        for size in range(0, 20):
+            data = os.urandom(size)
+            for chunk_size in (3, 6, 9):
+                source = io.BytesIO(b"skipped" + data)
+                source.seek(7)
+                body = _Base64Body(b"<", b">", source, size, chunk_size)
+                expected = b"<" + base64.b64encode(data) + b">"
+                self.assertEqual(expected, b"".join(body))
+                self.assertEqual(len(expected), len(body))
+                # Sending the body again reads the file again
+                self.assertEqual(expected, b"".join(body))
+
     @responses.activate
     def test_download_attachment(self):
 
@@ -79,3 +181,275 @@ class Test_Attachments(unittest.TestCase):
         with open(filename, 'r') as file:
             self.assertEqual("blabla", file.read())
         os.remove(temp.name)
+
+    @responses.activate
+    def test_download_attachment_in_chunks(self):
+        data = os.urandom(10000)
+        responses.add(responses.GET, 'http://localhost:9999/rest/repo/1', body=data,
+                      headers={"Content-Length": str(len(data))}, content_type='application/octet-stream')
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        attachment = Attachment(self.attachmentValues, slims.slims_api)
+        progress = []
+        with tempfile.TemporaryDirectory() as directory:
+            location = os.path.join(directory, "file.bin")
+            attachment.download_to(location, chunk_size=4096,
+                                   progress=lambda done, total: progress.append((done, total)))
+
+            with open(location, 'rb') as file:
+                self.assertEqual(data, file.read())
+            self.assertEqual(["file.bin"], os.listdir(directory))
+        self.assertEqual([(4096, 10000), (8192, 10000), (10000, 10000)], progress)
+
+    @responses.activate
+    def test_failed_download(self):
+        responses.add(responses.GET, 'http://localhost:9999/rest/repo/1', body="Not found", status=404)
+        responses.add(responses.GET, 'http://localhost:9999/rest/repo/1', body=b"x" * 100)
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        attachment = Attachment(self.attachmentValues, slims.slims_api)
+
+        def interrupt(done, total):
+            raise KeyboardInterrupt()
+
+        with tempfile.TemporaryDirectory() as directory:
+            location = os.path.join(directory, "file.bin")
+            self.assertRaises(_SlimsApiException, attachment.download_to, location)
+            self.assertEqual([], os.listdir(directory))
+
+            # What was downloaded is kept to be resumed later, but never at location
+            self.assertRaises(KeyboardInterrupt, attachment.download_to, location, 10, interrupt)
+            self.assertEqual(["file.bin.part"], os.listdir(directory))
+            self.assertRaises(KeyboardInterrupt, attachment.download_to, location, 10, interrupt, resume=False)
+            self.assertEqual([], os.listdir(directory))
+
+    def test_open_local_attachment(self):
+        with tempfile.TemporaryDirectory() as repo:
+            os.makedirs(os.path.join(repo, "a"))
+            with open(os.path.join(repo, "a", "file.txt"), 'wb') as file:
+                file.write(b"local content")
+            slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", repo_location=repo)
+            attachment = Attachment(self.attachmentValues, slims.slims_api)
+
+            with attachment.open() as file:
+                self.assertEqual(b"local", file.read(5))
+            with attachment.as_buffer() as buffer:
+                self.assertEqual(13, len(buffer))
+                self.assertEqual(b"content", buffer[6:])
+                self.assertEqual(b"local", bytes(memoryview(buffer)[:5]))
+
+            open(os.path.join(repo, "a", "file.txt"), 'wb').close()
+            with attachment.as_buffer() as buffer:
+                self.assertEqual(0, len(buffer))
+                self.assertEqual(b"", bytes(memoryview(buffer)))
+
+    @responses.activate
+    def test_open_remote_attachment(self):
+        data = os.urandom(300000)
+        responses.add(responses.GET, 'http://localhost:9999/rest/repo/1', body=data)
+        responses.add(responses.GET, 'http://localhost:9999/rest/repo/2', body=b"")
+        responses.add(responses.GET, 'http://localhost:9999/rest/repo/3', body="Not found", status=404)
+
+        # The repository is not reachable from here, slims is used instead
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", repo_location="/not/mounted")
+        attachment = Attachment(self.attachmentValues, slims.slims_api)
+
+        with attachment.open() as file:
+            self.assertEqual(data[:10], file.read(10))
+            self.assertEqual(data[10:], file.read())
+        with attachment.as_buffer() as buffer:
+            self.assertEqual(data, buffer[:])
+
+        empty = Attachment(dict(self.attachmentValues, pk=2), slims.slims_api)
+        with empty.as_buffer() as buffer:
+            self.assertEqual(b"", buffer[:])
+        empty.as_buffer().close()
+        missing = Attachment(dict(self.attachmentValues, pk=3), slims.slims_api)
+        self.assertRaises(_SlimsApiException, missing.open)
+        self.assertRaises(_SlimsApiException, missing.as_buffer)
+
+
+class _FlakyRepoHandler(BaseHTTPRequestHandler):
+    """ Serves server.data (version server.etag) with range support,
+    dropping the connection after server.drop_after bytes for the first
+    server.drops requests """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        data = self.server.data
+        if self.server.gzip == "always" or (self.server.gzip and "gzip" in self.headers.get("Accept-Encoding", "")):
+            body = gzip.compress(data)
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        start = 0
+        range_header = self.headers.get("Range")
+        self.server.ranges.append(range_header)
+        self.server.if_ranges.append(self.headers.get("If-Range"))
+        if_range = self.headers.get("If-Range")
+        if range_header is not None and self.server.ranges_supported and if_range in (None, self.server.etag):
+            start = int(range_header[len("bytes="):-1])
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */" + str(len(data)))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, len(data) - 1, len(data)))
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.send_header("ETag", self.server.etag)
+        self.end_headers()
+        if self.server.drops > 0:
+            self.server.drops -= 1
+            self.wfile.write(data[start:start + self.server.drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        self.wfile.write(data[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@mock.patch("slims.internal.time.sleep")
+class Test_Resumable_Downloads(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyRepoHandler)
+        self.server.data = os.urandom(100000)
+        self.server.etag = '"v1"'
+        self.server.gzip = False
+        self.server.ranges = []
+        self.server.if_ranges = []
+        self.server.ranges_supported = True
+        self.server.drops = 2
+        self.server.drop_after = 30000
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.slims = Slims("testSlims", "http://127.0.0.1:" + str(self.server.server_address[1]), "admin", "admin")
+        self.attachment = Attachment(Test_Attachments.attachmentValues, self.slims.slims_api)
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.directory.name, "file.bin")
+
+    def tearDown(self):
+        self.slims.slims_api.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def downloaded(self):
+        with open(self.location, 'rb') as file:
+            return file.read()
+
+    def test_resume(self, sleep):
+        self.attachment.download_to(self.location, chunk_size=10000,
+                                    expected_hash=hashlib.sha256(self.server.data).hexdigest())
+
+        self.assertEqual(self.server.data, self.downloaded())
+        self.assertEqual([None, "bytes=30000-", "bytes=60000-"], self.server.ranges)
+        self.assertEqual(["file.bin"], os.listdir(self.directory.name))
+
+    def test_resume_with_retry_policy(self, sleep):
+        policy = RetryPolicy(max_attempts=3)
+        self.slims.slims_api.retry_policy = policy
+        self.attachment.download_to(self.location, 10000, retries=0)
+
+        self.assertEqual(self.server.data, self.downloaded())
+        self.assertEqual({"ChunkedEncodingError": 2}, policy.retries_by_reason)
+
+    def test_resume_later(self, sleep):
+        self.assertRaises(requests.exceptions.ChunkedEncodingError,
+                          self.attachment.download_to, self.location, 10000, retries=1)
+        self.assertEqual(60000, os.path.getsize(self.location + ".part"))
+
+        self.attachment.download_to(self.location, 10000, expected_hash=hashlib.md5(self.server.data).hexdigest(),
+                                    hash_algorithm="md5")
+        self.assertEqual(self.server.data, self.downloaded())
+        self.assertEqual([None, "bytes=30000-", "bytes=60000-"], self.server.ranges)
+        self.assertEqual([None, '"v1"', '"v1"'], self.server.if_ranges)
+        self.assertEqual(["file.bin"], os.listdir(self.directory.name))
+
+    def test_resume_changed_file(self, sleep):
+        self.assertRaises(requests.exceptions.ChunkedEncodingError,
+                          self.attachment.download_to, self.location, 10000, retries=0)
+        with open(self.location + ".part.etag") as validator:
+            self.assertEqual('"v1"', validator.read())
+
+        self.server.data = os.urandom(50000)
+        self.server.etag = '"v2"'
+        self.attachment.download_to(self.location, 10000)
+        self.assertEqual(self.server.data, self.downloaded())
+        self.assertEqual([None, "bytes=30000-", "bytes=30000-"], self.server.ranges)
+        self.assertEqual([None, '"v1"', '"v2"'], self.server.if_ranges)
+
+    def test_part_without_validator(self, sleep):
+        self.server.drops = 0
+        with open(self.location + ".part", 'wb') as part:
+            part.write(os.urandom(1000))
+        self.attachment.download_to(self.location)
+        self.assertEqual(self.server.data, self.downloaded())
+        self.assertEqual([None], self.server.ranges)
+
+        # Resumed when the hash checks the result
+        os.rename(self.location, self.location + ".part")
+        self.attachment.download_to(self.location, expected_hash=hashlib.sha256(self.server.data).hexdigest())
+        self.assertEqual([None, "bytes=100000-"], self.server.ranges)
+        self.assertEqual([None, None], self.server.if_ranges)
+
+    def test_connection_error_is_retried(self, sleep):
+        self.server.drops = 0
+        get = self.slims.slims_api.get
+        errors = [requests.ConnectionError("refused"), requests.Timeout("slow")]
+
+        def flaky_get(*args, **kwargs):
+            if errors:
+                raise errors.pop(0)
+            return get(*args, **kwargs)
+
+        with mock.patch.object(self.slims.slims_api, "get", side_effect=flaky_get):
+            self.attachment.download_to(self.location)
+        self.assertEqual(self.server.data, self.downloaded())
+        self.assertEqual([mock.call(0.5), mock.call(1.0)], sleep.call_args_list)
+
+    def test_compression(self, sleep):
+        self.server.drops = 0
+        self.server.gzip = True
+        self.attachment.download_to(self.location)
+        self.assertEqual(self.server.data, self.downloaded())
+        with self.attachment.open() as file:
+            self.assertEqual(self.server.data, file.read())
+
+        # A server compressing anyway does not make the size check fail
+        self.server.gzip = "always"
+        os.remove(self.location)
+        self.attachment.download_to(self.location)
+        self.assertEqual(self.server.data, self.downloaded())
+
+    def test_resume_complete_part(self, sleep):
+        with open(self.location + ".part", 'wb') as part:
+            part.write(self.server.data)
+        with open(self.location + ".part.etag", 'w') as validator:
+            validator.write('"v1"')
+        self.attachment.download_to(self.location)
+        self.assertEqual(self.server.data, self.downloaded())
+        self.assertEqual(["bytes=100000-"], self.server.ranges)
+
+    def test_ranges_not_supported(self, sleep):
+        self.server.ranges_supported = False
+        self.server.drops = 1
+        self.attachment.download_to(self.location, 10000)
+
+        self.assertEqual(self.server.data, self.downloaded())
+        self.assertEqual([None, "bytes=30000-"], self.server.ranges)
+
+    def test_hash_mismatch(self, sleep):
+        self.assertRaises(_SlimsApiException, self.attachment.download_to, self.location,
+                          expected_hash=hashlib.sha256(b"something else").hexdigest())
+        self.assertEqual([], os.listdir(self.directory.name))
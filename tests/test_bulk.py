@@ -0,0 +1,176 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import responses
+
+from slims.internal import Record, _SlimsApiException, local
+from slims.slims import Slims
+
+
+class Test_Bulk(unittest.TestCase):
+
+    @responses.activate
+    def test_add_many(self):
+        def request_callback(request):
+            body = json.loads(request.body.decode('utf-8'))
+            if body["cntn_id"] == "bad":
+                return (400, {}, "Invalid id")
+            return (200, {}, json.dumps({"entities": [{
+                "pk": int(body["cntn_id"][3:]),
+                "tableName": "Content",
+                "columns": [{"name": "cntn_id", "value": body["cntn_id"]}]}]}))
+
+        responses.add_callback(
+            responses.PUT,
+            'http://localhost:9999/rest/Content',
+            callback=request_callback,
+            content_type='application/json',
+        )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        rows = [{"cntn_id": "DNA" + str(i)} for i in range(10)]
+        rows[3] = {"cntn_id": "bad"}
+        result = slims.add_many("Content", rows, batch_size=4, max_workers=3)
+
+        self.assertEqual(9, result.succeeded)
+        self.assertEqual(1, result.failed)
+        self.assertEqual([0, 1, 2, None, 4, 5, 6, 7, 8, 9],
+                         [record.pk() if record else None for record in result.results])
+        self.assertIsInstance(result.errors[3], _SlimsApiException)
+        self.assertGreater(result.throughput, 0)
+        self.assertRaises(_SlimsApiException, result.raise_for_errors)
+
+    @responses.activate
+    @mock.patch("slims.bulk.time.sleep")
+    def test_update_many(self, sleep):
+        attempts = {}
+
+        def request_callback(request):
+            pk = int(request.url.rsplit("/", 1)[1])
+            attempts[pk] = attempts.get(pk, 0) + 1
+            if pk == 2 and attempts[pk] == 1:
+                return (503, {}, "Service unavailable")
+            if pk == 3:
+                return (400, {}, "Not allowed")
+            body = json.loads(request.body.decode('utf-8'))
+            return (200, {}, json.dumps({"entities": [{
+                "pk": pk,
+                "tableName": "Content",
+                "columns": [{"name": "cntn_fk_status", "value": body["cntn_fk_status"]}]}]}))
+
+        for pk in range(1, 5):
+            responses.add_callback(
+                responses.POST,
+                'http://localhost:9999/rest/Content/' + str(pk),
+                callback=request_callback,
+                content_type='application/json',
+            )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        records = [Record({"pk": 1, "tableName": "Content", "columns": []}, slims.slims_api), 2, 3, 4]
+        result = slims.update_many(records, {"cntn_fk_status": 5}, table="Content")
+
+        self.assertEqual([1, 2, None, 4], [record.pk() if record else None for record in result.results])
+        self.assertEqual(5, result.results[1].cntn_fk_status.value)
+        self.assertEqual([2], list(result.errors))
+        self.assertEqual(400, result.errors[2].status_code)
+        self.assertEqual(1, result.retries)
+        self.assertEqual({1: 1, 2: 2, 3: 1, 4: 1}, attempts)
+
+    @responses.activate
+    @mock.patch("slims.bulk.time.sleep")
+    def test_remove_many(self, sleep):
+        responses.add(responses.DELETE, 'http://localhost:9999/rest/Content/1')
+        responses.add(responses.DELETE, 'http://localhost:9999/rest/Content/2', status=503)
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        result = slims.remove_many([1, 2], table="Content", retries=3)
+
+        self.assertEqual([1, None], result.results)
+        self.assertEqual(503, result.errors[1].status_code)
+        self.assertEqual(3, result.retries)
+        self.assertEqual([mock.call(0.5), mock.call(1.0), mock.call(2.0)], sleep.call_args_list)
+
+    def test_pks_need_a_table(self):
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        self.assertRaises(ValueError, slims.remove_many, [1])
+
+    @responses.activate
+    @mock.patch("slims.bulk.time.sleep")
+    def test_download_attachments(self, sleep):
+        def attachment(pk, name):
+            return {"pk": pk, "tableName": "Attachment", "columns": [{"name": "attm_name", "value": name}]}
+
+        responses.add(responses.GET, 'http://localhost:9999/rest/attachment/Content/1',
+                      json={"entities": [attachment(10, "a.txt"), attachment(11, "a.txt")]})
+
+        def fetch_callback(request):
+            body = json.loads(request.body.decode('utf-8'))
+            self.assertEqual([12], body["criteria"]["value"])
+            return (200, {}, json.dumps({"entities": [attachment(12, "../b.txt")]}))
+
+        responses.add_callback(responses.GET, 'http://localhost:9999/rest/Attachment/advanced',
+                               callback=fetch_callback, content_type='application/json')
+        for pk in (10, 11, 12):
+            responses.add(responses.GET, 'http://localhost:9999/rest/repo/' + str(pk), body=b"x" * pk)
+        responses.add(responses.GET, 'http://localhost:9999/rest/repo/13', body="Unavailable", status=503)
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        records = [Record({"pk": 1, "tableName": "Content", "columns": []}, slims.slims_api),
+                   12,
+                   slims.slims_api.record(attachment(13, "c.txt"))]
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, "target")
+            result = slims.download_attachments(records, target, max_workers=2)
+
+            self.assertEqual([os.path.join(target, "a.txt"), os.path.join(target, "11_a.txt"),
+                              os.path.join(target, "b.txt"), None], result.results)
+            self.assertEqual(["11_a.txt", "a.txt", "b.txt"], sorted(os.listdir(target)))
+            with open(os.path.join(target, "11_a.txt"), "rb") as file:
+                self.assertEqual(b"x" * 11, file.read())
+        self.assertEqual([3], list(result.errors))
+        self.assertEqual(503, result.errors[3].status_code)
+        self.assertEqual(2, result.retries)
+        self.assertEqual(33, result.transferred)
+        self.assertGreater(result.transfer_rate, 0)
+
+    @responses.activate
+    def test_download_unknown_attachments(self):
+        responses.add(responses.GET, 'http://localhost:9999/rest/Attachment/advanced', json={"entities": []})
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        self.assertRaises(KeyError, slims.download_attachments, [1, 2], "unused")
+
+    @responses.activate
+    def test_download_attachments_names_and_user(self):
+        def attachment(pk, name):
+            return {"pk": pk, "tableName": "Attachment", "columns": [{"name": "attm_name", "value": name}]}
+
+        users = []
+
+        def list_callback(request):
+            users.append(request.headers.get("X-SLIMS-REQUESTED-FOR"))
+            return (200, {}, json.dumps({"entities": [attachment(5, "7_a.txt"), attachment(6, "a.txt"),
+                                                      attachment(7, "a.txt"), attachment(8, "a.txt")]}))
+
+        responses.add_callback(responses.GET, 'http://localhost:9999/rest/attachment/Content/1',
+                               callback=list_callback, content_type='application/json')
+        for pk in (5, 6, 7, 8):
+            responses.add(responses.GET, 'http://localhost:9999/rest/repo/' + str(pk), body=b"x" * pk)
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        local.user = "john"
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                result = slims.download_attachments(
+                    [Record({"pk": 1, "tableName": "Content", "columns": []}, slims.slims_api)], directory)
+
+                self.assertEqual(["7_a.txt", "a.txt", "7_7_a.txt", "8_a.txt"],
+                                 [os.path.basename(location) for location in result.results])
+                with open(os.path.join(directory, "7_7_a.txt"), "rb") as file:
+                    self.assertEqual(b"x" * 7, file.read())
+        finally:
+            del local.user
+        self.assertEqual(["john"], users)
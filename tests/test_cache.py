@@ -0,0 +1,207 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import responses
+
+from slims.cache import RecordCache
+from slims.criteria import equals
+from slims.slims import Slims
+
+
+def content(pk, content_id):
+    return {"pk": pk,
+            "tableName": "Content",
+            "columns": [{"datatype": "STRING", "name": "cntn_id", "title": "Id", "value": content_id}]}
+
+
+class _ConditionalHandler(BaseHTTPRequestHandler):
+    """ Serves Content/1 with an ETag, and Content/2 with a Last-Modified date """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match"),
+                                     self.headers.get("If-Modified-Since")))
+        pk = int(self.path.rsplit("/", 1)[1])
+        version = self.server.versions[pk]
+        if pk == 1:
+            validator = ("ETag", '"v' + str(version) + '"')
+            not_modified = self.headers.get("If-None-Match") == validator[1]
+        else:
+            validator = ("Last-Modified", "Tue, 0" + str(version) + " Jun 2021 10:00:00 GMT")
+            not_modified = self.headers.get("If-Modified-Since") == validator[1]
+        if not_modified:
+            self.send_response(304)
+            self.send_header(*validator)
+            self.end_headers()
+            return
+        body = json.dumps({"entities": [content(pk, "DNA" + str(version))]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header(*validator)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Test_Conditional_Requests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ConditionalHandler)
+        self.server.requests = []
+        self.server.versions = {1: 1, 2: 1}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.cache = RecordCache(ttl=10)
+        self.slims = Slims("testSlims", "http://127.0.0.1:" + str(self.server.server_address[1]),
+                           "admin", "admin", cache=self.cache)
+
+    def tearDown(self):
+        self.slims.slims_api.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    @mock.patch("slims.cache.time.monotonic")
+    def test_etag(self, monotonic):
+        monotonic.return_value = 100
+        self.slims.fetch_by_pk("Content", 1)
+        monotonic.return_value = 111
+        record = self.slims.fetch_by_pk("Content", 1)
+
+        self.assertEqual("DNA1", record.cntn_id.value)
+        self.assertEqual([("/rest/Content/1", None, None), ("/rest/Content/1", '"v1"', None)],
+                         self.server.requests)
+        self.assertEqual(1, self.cache.revalidations)
+
+        # Fresh again after the 304
+        self.slims.fetch_by_pk("Content", 1)
+        self.assertEqual(2, len(self.server.requests))
+
+        self.server.versions[1] = 2
+        monotonic.return_value = 122
+        record = self.slims.fetch_by_pk("Content", 1)
+        self.assertEqual("DNA2", record.cntn_id.value)
+        self.assertEqual(("/rest/Content/1", '"v1"', None), self.server.requests[-1])
+        self.assertEqual(1, self.cache.revalidations)
+
+        monotonic.return_value = 133
+        self.slims.fetch_by_pk("Content", 1)
+        self.assertEqual(("/rest/Content/1", '"v2"', None), self.server.requests[-1])
+        self.assertEqual(2, self.cache.revalidations)
+
+    @mock.patch("slims.cache.time.monotonic")
+    def test_last_modified(self, monotonic):
+        monotonic.return_value = 100
+        self.slims.fetch_by_pk("Content", 2)
+        monotonic.return_value = 111
+        record = self.slims.fetch_by_pk("Content", 2)
+
+        self.assertEqual("DNA1", record.cntn_id.value)
+        self.assertEqual(("/rest/Content/2", None, "Tue, 01 Jun 2021 10:00:00 GMT"), self.server.requests[-1])
+        self.assertEqual(1, self.cache.revalidations)
+
+
+class Test_Cache(unittest.TestCase):
+
+    def setUp(self):
+        responses.start()
+        responses.add(responses.GET, 'http://localhost:9999/rest/Content/1',
+                      json={"entities": [content(1, "DNA1")]}, content_type='application/json')
+        responses.add(responses.GET, 'http://localhost:9999/rest/Content/2',
+                      json={"entities": [content(2, "DNA2")]}, content_type='application/json')
+
+        def request_callback(request):
+            body = json.loads(request.body.decode('utf-8'))
+            return (200, {}, json.dumps({"entities": [content(int(body["criteria"]["value"]), "DNA")]}))
+
+        responses.add_callback(responses.GET, 'http://localhost:9999/rest/Content/advanced',
+                               callback=request_callback, content_type='application/json')
+        self.cache = RecordCache()
+        self.slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", cache=self.cache)
+
+    def tearDown(self):
+        responses.stop()
+        responses.reset()
+
+    def test_fetch_by_pk(self):
+        first = self.slims.fetch_by_pk("Content", 1)
+        second = self.slims.fetch_by_pk("Content", 1)
+
+        self.assertEqual(1, len(responses.calls))
+        self.assertEqual("DNA1", second.cntn_id.value)
+        self.assertEqual("Id", second.cntn_id.title)
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+        # Records built from the cache do not share their values
+        first.cntn_id.value = "changed"
+        self.assertEqual("DNA1", self.slims.fetch_by_pk("Content", 1).cntn_id.value)
+        self.assertEqual("DNA1", second.cntn_id.value)
+
+    def test_fetch_criteria(self):
+        self.slims.fetch("Content", equals("cntn_pk", 1))
+        self.slims.fetch("Content", equals("cntn_pk", 2))
+        self.slims.fetch("Content", equals("cntn_pk", 1))
+        self.slims.fetch("Content", equals("cntn_pk", 1), sort=["cntn_id"])
+
+        self.assertEqual(3, len(responses.calls))
+        self.assertEqual(1, self.cache.hits)
+
+    def test_write_invalidates_table(self):
+        responses.add(responses.POST, 'http://localhost:9999/rest/Content/1',
+                      json={"entities": [content(1, "DNA3")]}, content_type='application/json')
+        responses.add(responses.GET, 'http://localhost:9999/rest/ContentType/1',
+                      json={"entities": [{"pk": 1, "tableName": "ContentType", "columns": []}]},
+                      content_type='application/json')
+
+        record = self.slims.fetch_by_pk("Content", 1)
+        self.slims.fetch_by_pk("Content", 2)
+        self.slims.fetch_by_pk("ContentType", 1)
+        record.update({"cntn_id": "DNA3"})
+        self.slims.fetch_by_pk("Content", 1)
+        self.slims.fetch_by_pk("ContentType", 1)
+
+        self.assertEqual(5, len(responses.calls))
+        self.assertEqual(2, self.cache.invalidations)
+        self.assertEqual(1, self.cache.hits)
+
+    def test_max_size(self):
+        self.cache.max_size = 1
+        self.slims.fetch_by_pk("Content", 1)
+        self.slims.fetch_by_pk("Content", 2)
+        self.slims.fetch_by_pk("Content", 1)
+
+        self.assertEqual(3, len(responses.calls))
+        self.assertEqual(2, self.cache.evictions)
+        self.assertEqual(1, len(self.cache))
+
+    @mock.patch("slims.cache.time.monotonic")
+    def test_ttl(self, monotonic):
+        self.cache.table_ttls = {"Content": 10}
+        monotonic.return_value = 100
+        self.slims.fetch_by_pk("Content", 1)
+        monotonic.return_value = 109
+        self.slims.fetch_by_pk("Content", 1)
+        monotonic.return_value = 110
+        self.slims.fetch_by_pk("Content", 1)
+
+        self.assertEqual(2, len(responses.calls))
+
+        self.cache.table_ttls = {"Content": 0}
+        self.slims.fetch_by_pk("Content", 2)
+        self.slims.fetch_by_pk("Content", 2)
+        self.assertEqual(4, len(responses.calls))
+
+    def test_stale_put(self):
+        cache = RecordCache()
+        generation = cache.generation
+        cache.invalidate("Content")
+        cache.put("key", {"Content"}, [], generation)
+        self.assertIsNone(cache.get("key"))
+
+        cache.put("key", {"Content"}, [], cache.generation)
+        self.assertEqual([], cache.get("key"))
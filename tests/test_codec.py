@@ -0,0 +1,127 @@
+import json
+import unittest
+
+import responses
+
+from slims.codec import JsonCodec, OrjsonCodec
+from slims.slims import Slims
+
+
+def content_entity(pk):
+    return {"pk": pk,
+            "tableName": "Content",
+            "columns": [
+                {"datatype": "STRING", "name": "cntn_id", "title": "Id", "position": 2,
+                 "value": "échantillon-" + str(pk), "hidden": False, "editable": False},
+                {"datatype": "QUANTITY", "name": "cntn_quantity", "title": "Quantity", "position": 3,
+                 "value": 4.184, "unit": "µL", "hidden": False, "editable": True},
+                {"datatype": "FOREIGN_KEY", "name": "cntn_fk_contentType", "title": "Type", "position": 4,
+                 "value": 12, "displayValue": "DNA", "hidden": False, "editable": True},
+                {"datatype": "DATE", "name": "cntn_createdOn", "title": "Created on", "position": 5,
+                 "value": 1601971560000, "subType": "datetime", "hidden": True, "editable": False},
+                {"datatype": "BOOLEAN", "name": "cntn_active", "value": None},
+                {"datatype": "FLOAT", "name": "cntn_concentration", "value": 6.02214076e+23},
+                {"datatype": "STRING", "name": "cntn_comments", "value": "line 1\nline 2\t\"quoted\" \\ 🧬"},
+            ],
+            "links": [{"rel": "cntn_fk_contentType", "href": "http://localhost:9999/rest/ContentType/12"}]}
+
+
+class Test_Codec(unittest.TestCase):
+
+    payloads = [
+        {"entities": [content_entity(pk) for pk in range(5)]},
+        {"entities": []},
+        {"cntn_id": "ID", "cntn_status": 1, "cntn_fk_contentType": 1},
+        {"sortBy": ["-cntn_barCode"], "startRow": None, "endRow": 10,
+         "criteria": {"operator": "and", "criteria": [
+             {"fieldName": "cntn_id", "operator": "inSet", "value": ["a", "b", 3, 4.5, True]}]}},
+        {"1": [], "nested": {"deeper": {"deepest": [[], {}, [None]]}}, "big": 2 ** 62, "negative": -1.5e-10},
+    ]
+
+    def codecs(self):
+        return [JsonCodec(), OrjsonCodec()]
+
+    def test_round_trip(self):
+        for codec in self.codecs():
+            for payload in self.payloads:
+                self.assertEqual(payload, codec.loads(codec.dumps(payload)))
+
+    def test_same_as_standard_library(self):
+        for codec in self.codecs():
+            for payload in self.payloads:
+                self.assertEqual(payload, json.loads(codec.dumps(payload).decode("utf-8")))
+                self.assertEqual(payload, codec.loads(json.dumps(payload).encode("utf-8")))
+
+    def test_non_string_keys(self):
+        for codec in self.codecs():
+            self.assertEqual({"1": "a"}, codec.loads(codec.dumps({1: "a"})))
+
+    def test_big_integers(self):
+        for codec in self.codecs():
+            self.assertEqual({"pk": 2 ** 70}, codec.loads(codec.dumps({"pk": 2 ** 70})))
+
+    def test_non_finite_floats(self):
+        for codec in self.codecs():
+            for value in (float("nan"), float("inf"), -float("inf")):
+                self.assertRaises(ValueError, codec.dumps, {"cntn_quantity": value})
+                self.assertRaises(ValueError, codec.dumps, {"values": [1.5, {"deeper": value}]})
+            self.assertEqual({"cntn_quantity": None}, codec.loads(codec.dumps({"cntn_quantity": None})))
+
+    def test_default_codec(self):
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        self.assertIs(JsonCodec, type(slims.slims_api.codec))
+
+    @responses.activate
+    def test_slims_uses_codec(self):
+        class CountingCodec(JsonCodec):
+            calls = 0
+
+            def dumps(self, value):
+                CountingCodec.calls += 1
+                return super().dumps(value)
+
+            def loads(self, data):
+                CountingCodec.calls += 1
+                return super().loads(data)
+
+        responses.add(
+            responses.PUT,
+            'http://localhost:9999/rest/Content',
+            json={"entities": [content_entity(1)]},
+            content_type='application/json',
+        )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", json_codec=CountingCodec())
+        added = slims.add("Content", {"cntn_id": "échantillon-1"})
+        self.assertEqual("échantillon-1", added.cntn_id.value)
+        self.assertEqual(2, CountingCodec.calls)
+        self.assertEqual("application/json", responses.calls[0].request.headers["Content-Type"])
+
+    @responses.activate
+    def test_fetch_uses_codec(self):
+        class UpperCodec(JsonCodec):
+            loaded = []
+
+            def loads(self, data):
+                UpperCodec.loaded.append(data)
+                value = super().loads(data)
+                for entity in value["entities"]:
+                    entity["columns"][0]["value"] = entity["columns"][0]["value"].upper()
+                return value
+
+        responses.add(
+            responses.GET,
+            'http://localhost:9999/rest/Content/advanced',
+            json={"entities": [content_entity(1), content_entity(2)]},
+            content_type='application/json',
+        )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", json_codec=UpperCodec())
+        records = slims.fetch("Content", None)
+        self.assertEqual(["ÉCHANTILLON-1", "ÉCHANTILLON-2"], [record.cntn_id.value for record in records])
+        self.assertEqual(1, len(UpperCodec.loaded))
+
+        self.assertEqual(["ÉCHANTILLON-1", "ÉCHANTILLON-2"],
+                         [entity["columns"][0]["value"]
+                          for entity in slims.slims_api.iter_json_entities("Content/advanced")])
+        self.assertEqual(2, len(UpperCodec.loaded))
@@ -0,0 +1,49 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from slims.slims import Slims
+
+
+class _EntitiesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.client_ports.add(self.client_address[1])
+        body = json.dumps({"entities": []}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Test_Connection(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _EntitiesHandler)
+        self.server.client_ports = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:" + str(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_reused(self):
+        slims = Slims("testSlims", self.url, "admin", "admin")
+        for i in range(5):
+            slims.fetch_by_pk("Content", i)
+        slims.slims_api.close()
+
+        self.assertEqual(1, len(self.server.client_ports))
+
+    def test_pool_size(self):
+        slims = Slims("testSlims", self.url, "admin", "admin", pool_size=3)
+        adapter = slims.slims_api.session.get_adapter(self.url)
+        self.assertEqual(3, adapter._pool_maxsize)
@@ -1,10 +1,15 @@
 import json
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
 import responses
 
+from slims.cache import RecordCache
 from slims.criteria import equals
-from slims.internal import Attachment, Record
+from slims.internal import Attachment, Record, _EntityStream, _SlimsApiException, local
 from slims.slims import Slims
 
 
@@ -36,6 +41,28 @@ class Test_Fetching_Data(unittest.TestCase):
         entity = slims.fetch_by_pk("Content", 1)
         self.assertEqual(entity.cntn_id.value, "sample1")
 
+    @responses.activate
+    def test_fetch_by_pk_columns(self):
+        responses.add(
+            responses.GET,
+            'http://localhost:9999/rest/Content/1',
+            json={"entities": [{
+                "pk": 1,
+                "tableName": "Content",
+                "columns": [
+                    {"name": "cntn_id", "value": "sample1"},
+                    {"name": "cntn_barCode", "value": "00001"},
+                    {"name": "cntn_comments", "value": "a long text"},
+                ]}]},
+            content_type='application/json',
+        )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        entity = slims.fetch_by_pk("Content", 1, columns=["cntn_id", "cntn_barCode"])
+        self.assertEqual(["cntn_id", "cntn_barCode"], [column["name"] for column in entity.json_entity["columns"]])
+        self.assertEqual("00001", entity.cntn_barCode.value)
+        self.assertFalse(hasattr(entity, "cntn_comments"))
+
     @responses.activate
     def test_fetch_by_pk_nothing_returned(self):
         responses.add(
@@ -78,6 +105,66 @@ class Test_Fetching_Data(unittest.TestCase):
                                end=1)
         self.assertEquals(entities, [])
 
+    @responses.activate
+    def test_fetch_iter(self):
+        requested_pages = []
+
+        def request_callback(request):
+            body = json.loads(request.body.decode('utf-8'))
+            self.assertEqual(body["sortBy"], ["cntn_pk"])
+            self.assertEqual(body["criteria"]["fieldName"], "cntn_id")
+            requested_pages.append((body["startRow"], body["endRow"]))
+            entities = [{"pk": pk, "tableName": "Content", "columns": []}
+                        for pk in range(body["startRow"], min(body["endRow"], 5))]
+            return (200, {}, json.dumps({"entities": entities}))
+
+        responses.add_callback(
+            responses.GET,
+            'http://localhost:9999/rest/Content/advanced',
+            callback=request_callback,
+            content_type='application/json',
+        )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        with mock.patch.object(slims.slims_api, "iter_json_entities",
+                               wraps=slims.slims_api.iter_json_entities) as streamed:
+            records = slims.fetch_iter("Content", equals("cntn_id", "test"), sort=["cntn_pk"], page_size=2)
+            self.assertEqual(0, next(records).pk())
+            # The first page is still being read
+            self.assertEqual(1, streamed.call_count)
+            self.assertEqual([1, 2, 3, 4], [record.pk() for record in records])
+        self.assertEqual([(0, 2), (2, 4), (4, 6)], requested_pages)
+        self.assertEqual(3, streamed.call_count)
+
+        # Fetches stream as well when they are not shared or cached
+        slims.slims_api.coalesce = False
+        with mock.patch.object(slims.slims_api, "iter_json_entities",
+                               wraps=slims.slims_api.iter_json_entities) as streamed:
+            records = slims.fetch("Content", equals("cntn_id", "test"), sort=["cntn_pk"], start=0, end=2)
+        self.assertEqual([0, 1], [record.pk() for record in records])
+        self.assertEqual(1, streamed.call_count)
+
+    @responses.activate
+    def test_fetch_iter_prefetch(self):
+        def request_callback(request):
+            body = json.loads(request.body.decode('utf-8'))
+            # Later pages answer faster, they must still come out in order
+            time.sleep(0.01 * (10 - body["startRow"]))
+            entities = [{"pk": pk, "tableName": "Content", "columns": []}
+                        for pk in range(body["startRow"], min(body["endRow"], 9))]
+            return (200, {}, json.dumps({"entities": entities}))
+
+        responses.add_callback(
+            responses.GET,
+            'http://localhost:9999/rest/Content/advanced',
+            callback=request_callback,
+            content_type='application/json',
+        )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        records = slims.fetch_iter("Content", None, sort=["cntn_pk"], page_size=2, prefetch=3)
+        self.assertEqual(list(range(9)), [record.pk() for record in records])
+
     @responses.activate
     def test_fetch_incoming_link(self):
         responses.add(
@@ -155,6 +242,82 @@ class Test_Fetching_Data(unittest.TestCase):
         entity = slims.fetch_by_pk("Content", 1)
         self.assertIsInstance(entity.follow("-rslt_fk_content")[0], Record)
 
+    @responses.activate
+    def test_follow_many_outgoing(self):
+        def content_type(pk):
+            return {"pk": pk,
+                    "tableName": "ContentType",
+                    "columns": [{"name": "cntt_pk", "value": pk}]}
+
+        def advanced_callback(request):
+            body = json.loads(request.body.decode('utf-8'))
+            self.assertEqual(body["criteria"]["operator"], "inSet")
+            self.assertEqual(body["criteria"]["fieldName"], "cntt_pk")
+            return (200, {}, json.dumps({"entities": [content_type(pk) for pk in body["criteria"]["value"]]}))
+
+        responses.add(
+            responses.GET,
+            'http://localhost:9999/rest/ContentType/2',
+            json={"entities": [content_type(2)]},
+            content_type='application/json',
+        )
+        responses.add_callback(
+            responses.GET,
+            'http://localhost:9999/rest/ContentType/advanced',
+            callback=advanced_callback,
+            content_type='application/json',
+        )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        records = [Record({"pk": pk,
+                           "tableName": "Content",
+                           "columns": [],
+                           "links": [{"rel": "cntn_fk_contentType",
+                                      "href": "http://localhost:9999/rest/ContentType/" + str(type_pk)}]},
+                          slims.slims_api)
+                   for pk, type_pk in [(1, 2), (2, 3), (3, 2), (4, 4)]]
+        records.append(Record({"pk": 5, "tableName": "Content", "columns": [], "links": []}, slims.slims_api))
+
+        followed = slims.follow_many(records, "cntn_fk_contentType", chunk_size=1)
+        self.assertEqual([2, 3, 2, 4], [record.pk() for record in followed[:4]])
+        self.assertIsNone(followed[4])
+        self.assertEqual(3, len(responses.calls))
+
+        self.assertEqual(3, records[1].follow("cntn_fk_contentType").pk())
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_follow_many_incoming(self):
+        def advanced_callback(request):
+            body = json.loads(request.body.decode('utf-8'))
+            self.assertEqual(body["criteria"]["fieldName"], "rslt_fk_content")
+            self.assertEqual(sorted(body["criteria"]["value"]), [1, 2])
+            return (200, {}, json.dumps({"entities": [
+                {"pk": 10, "tableName": "Result", "columns": [{"name": "rslt_fk_content", "value": 1}]},
+                {"pk": 11, "tableName": "Result", "columns": [{"name": "rslt_fk_content", "value": 1}]},
+            ]}))
+
+        responses.add_callback(
+            responses.GET,
+            'http://localhost:9999/rest/Result/advanced',
+            callback=advanced_callback,
+            content_type='application/json',
+        )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        records = [Record({"pk": pk,
+                           "tableName": "Content",
+                           "columns": [],
+                           "links": [{"rel": "-rslt_fk_content",
+                                      "href": "http://localhost:9999/rest/Result?rslt_fk_content=" + str(pk)}]},
+                          slims.slims_api)
+                   for pk in [1, 2]]
+
+        followed = slims.follow_many(records, "-rslt_fk_content")
+        self.assertEqual([[10, 11], []], [[result.pk() for result in results] for results in followed])
+        self.assertEqual([], records[1].follow("-rslt_fk_content"))
+        self.assertEqual(1, len(responses.calls))
+
     @responses.activate
     def test_fetch_unknown_link(self):
         responses.add(
@@ -191,3 +354,138 @@ class Test_Fetching_Data(unittest.TestCase):
 
         attachments = record.attachments()
         self.assertIsInstance(attachments[0], Attachment)
+
+    @responses.activate
+    def test_coalesce_identical_fetches(self):
+        released = threading.Event()
+        users = []
+
+        def request_callback(request):
+            users.append(request.headers.get("X-SLIMS-REQUESTED-FOR"))
+            released.wait(5)
+            return (200, {}, json.dumps({"entities": [{
+                "pk": 1,
+                "tableName": "ContentType",
+                "columns": [{"name": "cntp_name", "value": "DNA"}]}]}))
+
+        responses.add_callback(responses.GET, 'http://localhost:9999/rest/ContentType/1',
+                               callback=request_callback, content_type='application/json')
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+
+        def fetch(user):
+            local.user = user
+            return slims.fetch_by_pk("ContentType", 1)
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [executor.submit(fetch, user) for user in ["john", "john", "jane", "john", "jane"]]
+            # Wait until every thread has joined the call of its user
+            deadline = time.monotonic() + 5
+            while (sum(flight.followers for flight in list(slims.slims_api._flights.values())) < 3
+                   and time.monotonic() < deadline):
+                time.sleep(0.001)
+            released.set()
+            records = [future.result() for future in futures]
+
+        self.assertEqual(["jane", "john"], sorted(users))
+        self.assertEqual({}, slims.slims_api._flights)
+        self.assertEqual(["DNA"] * 5, [record.cntp_name.value for record in records])
+        # Every caller can change its own record without affecting the others
+        records[0].cntp_name.value = "RNA"
+        self.assertEqual("DNA", records[1].cntp_name.value)
+        self.assertIsNot(records[0].json_entity, records[1].json_entity)
+
+    @responses.activate
+    def test_fetch_after_write_is_not_coalesced(self):
+        state = {"value": "old"}
+        sent = threading.Event()
+        released = threading.Event()
+
+        def content(value):
+            return json.dumps({"entities": [{"pk": 1,
+                                             "tableName": "Content",
+                                             "columns": [{"name": "cntn_id", "value": value}]}]})
+
+        def get_callback(request):
+            value = state["value"]
+            if not sent.is_set():
+                sent.set()
+                released.wait(5)
+            return (200, {}, content(value))
+
+        def post_callback(request):
+            state["value"] = "new"
+            return (200, {}, content("new"))
+
+        responses.add_callback(responses.GET, 'http://localhost:9999/rest/Content/1',
+                               callback=get_callback, content_type='application/json')
+        responses.add_callback(responses.POST, 'http://localhost:9999/rest/Content/1',
+                               callback=post_callback, content_type='application/json')
+        cache = RecordCache()
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", cache=cache)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            early = executor.submit(slims.fetch_by_pk, "Content", 1)
+            sent.wait(5)
+            slims.slims_api.post("Content/1", {"cntn_id": "new"})
+            self.assertEqual("new", slims.fetch_by_pk("Content", 1).cntn_id.value)
+            released.set()
+            self.assertEqual("old", early.result().cntn_id.value)
+
+        # The fetch sent before the write did not cache its entities
+        self.assertEqual("new", slims.fetch_by_pk("Content", 1).cntn_id.value)
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_coalesce_failure(self):
+        released = threading.Event()
+
+        def request_callback(request):
+            released.wait(5)
+            return (500, {}, "Server error")
+
+        responses.add_callback(responses.GET, 'http://localhost:9999/rest/ContentType/1',
+                               callback=request_callback, content_type='application/json')
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(slims.fetch_by_pk, "ContentType", 1) for i in range(3)]
+            deadline = time.monotonic() + 5
+            while (sum(flight.followers for flight in list(slims.slims_api._flights.values())) < 2
+                   and time.monotonic() < deadline):
+                time.sleep(0.001)
+            released.set()
+            for future in futures:
+                self.assertRaises(_SlimsApiException, future.result)
+
+        self.assertEqual(1, len(responses.calls))
+
+        slims.slims_api.coalesce = False
+        self.assertRaises(_SlimsApiException, slims.fetch_by_pk, "ContentType", 1)
+        self.assertEqual(2, len(responses.calls))
+
+    def test_entity_stream(self):
+        entities = [{"pk": pk,
+                     "tableName": "Content",
+                     "columns": [{"name": "cntn_id", "value": "échantillon " + str(pk), "position": 12345}]}
+                    for pk in range(3)]
+        document = json.dumps({"total": 3, "entities": entities, "next": None}, indent=1).encode("utf-8")
+
+        for chunk_size in range(1, 50):
+            chunks = [document[i:i + chunk_size] for i in range(0, len(document), chunk_size)]
+            self.assertEqual(entities, list(_EntityStream(chunks)))
+
+        self.assertEqual([], list(_EntityStream([b'{"entities": []}'])))
+        self.assertEqual([], list(_EntityStream([b'{}'])))
+        self.assertRaises(ValueError, list, _EntityStream([document[:-10]]))
+
+    def test_entity_stream_large_value(self):
+        entities = [{"pk": 1, "columns": [{"name": "cntn_comments", "value": "x" * 1000000}]}, {"pk": 2}]
+        document = json.dumps({"entities": entities}).encode("utf-8")
+        chunks = [document[i:i + 1000] for i in range(0, len(document), 1000)]
+        stream = _EntityStream(chunks)
+        decoder = mock.Mock(wraps=stream._decoder)
+        stream._decoder = decoder
+
+        self.assertEqual(entities, list(stream))
+        # The value is not decoded again for each of its 1000 chunks
+        self.assertLess(decoder.raw_decode.call_count, 20)
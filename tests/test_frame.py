@@ -0,0 +1,74 @@
+import json
+import unittest
+
+import pyarrow
+import responses
+
+from slims.criteria import equals
+from slims.slims import Slims
+
+
+class Test_Frame(unittest.TestCase):
+
+    def setUp(self):
+        def result(pk, content_pk, value, created_on):
+            return {"pk": pk,
+                    "tableName": "Result",
+                    "columns": [
+                        {"name": "rslt_fk_content", "datatype": "FOREIGN_KEY",
+                         "value": content_pk, "displayValue": "DNA" + str(content_pk)},
+                        {"name": "rslt_value", "datatype": "QUANTITY", "value": value, "unit": "kg"},
+                        {"name": "rslt_createdOn", "datatype": "DATE", "subType": "datetime",
+                         "value": created_on},
+                        {"name": "rslt_comment", "datatype": "STRING", "value": "ok"},
+                    ]}
+
+        def request_callback(request):
+            body = json.loads(request.body.decode('utf-8'))
+            self.assertEqual(body["criteria"]["fieldName"], "rslt_fk_test")
+            return (200, {}, json.dumps({"entities": [
+                result(1, 10, 4.5, 1601971560000),
+                result(2, None, None, None),
+            ]}))
+
+        responses.start()
+        responses.add_callback(
+            responses.GET,
+            'http://localhost:9999/rest/Result/advanced',
+            callback=request_callback,
+            content_type='application/json',
+        )
+        self.slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+
+    def tearDown(self):
+        responses.stop()
+        responses.reset()
+
+    def test_fetch_frame(self):
+        frame = self.slims.fetch_frame("Result", equals("rslt_fk_test", 2))
+
+        self.assertEqual(["pk", "rslt_fk_content", "rslt_fk_content_display", "rslt_value", "rslt_value_unit",
+                          "rslt_createdOn", "rslt_comment"], list(frame.columns))
+        self.assertEqual([1, 2], list(frame["pk"]))
+        self.assertEqual("Int64", str(frame["rslt_fk_content"].dtype))
+        self.assertEqual(10, frame["rslt_fk_content"][0])
+        self.assertEqual("DNA10", frame["rslt_fk_content_display"][0])
+        self.assertEqual(4.5, frame["rslt_value"][0])
+        self.assertEqual("kg", frame["rslt_value_unit"][0])
+        self.assertTrue(str(frame["rslt_createdOn"].dtype).startswith("datetime64"))
+        self.assertEqual("2020-10-06 08:06:00", str(frame["rslt_createdOn"][0]))
+        self.assertTrue(frame["rslt_createdOn"].isna()[1])
+        self.assertTrue(frame["rslt_fk_content"].isna()[1])
+
+    def test_fetch_frame_columns(self):
+        frame = self.slims.fetch_frame("Result", equals("rslt_fk_test", 2), columns=["rslt_value"])
+        self.assertEqual(["pk", "rslt_value", "rslt_value_unit"], list(frame.columns))
+
+    def test_fetch_arrow(self):
+        table = self.slims.fetch_frame("Result", equals("rslt_fk_test", 2), arrow=True)
+
+        self.assertEqual(pyarrow.int64(), table.schema.field("rslt_fk_content").type)
+        self.assertEqual(pyarrow.float64(), table.schema.field("rslt_value").type)
+        self.assertEqual(pyarrow.timestamp("ms"), table.schema.field("rslt_createdOn").type)
+        self.assertEqual([10, None], table.column("rslt_fk_content").to_pylist())
+        self.assertEqual(["kg", "kg"], table.column("rslt_value_unit").to_pylist())
@@ -1,3 +1,4 @@
+import json
 import unittest
 
 import responses
@@ -30,6 +31,91 @@ class Test_Modifying(unittest.TestCase):
         updated = record.update({"test": "foo"})
         self.assertIsInstance(updated, Record)
 
+    @responses.activate
+    def test_save_sends_changed_columns(self):
+        def request_callback(request):
+            body = json.loads(request.body.decode('utf-8'))
+            self.assertDictEqual({"cntn_id": "new id"}, body)
+            return (200, {}, json.dumps({"entities": [{
+                "pk": 1,
+                "tableName": "Content",
+                "columns": [{"name": "cntn_id", "value": "new id"},
+                            {"name": "cntn_comments", "value": "long unchanged text"},
+                            {"name": "cntn_modifiedOn", "value": 1601971560000}]}]}))
+
+        responses.add_callback(
+            responses.POST,
+            'http://localhost:9999/rest/Content/1',
+            callback=request_callback,
+            content_type='application/json',
+        )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        record = Record({"pk": 1,
+                         "tableName": "Content",
+                         "columns": [{"name": "cntn_id", "value": "id"},
+                                     {"name": "cntn_comments", "value": "long unchanged text"}]},
+                        slims.slims_api)
+
+        record.cntn_comments.value
+        record.cntn_id.value = "new id"
+        self.assertEqual({"cntn_id": "new id"}, record.changes())
+        self.assertIs(record, record.save())
+
+        self.assertEqual(1, len(responses.calls))
+        self.assertEqual({}, record.changes())
+        self.assertEqual("new id", record.cntn_id.value)
+        self.assertEqual(1601971560000, record.cntn_modifiedOn.value)
+
+        record.save()
+        self.assertEqual(1, len(responses.calls))
+
+    @responses.activate
+    def test_assign_column(self):
+        def request_callback(request):
+            self.assertDictEqual({"cntn_id": "b"}, json.loads(request.body.decode('utf-8')))
+            return (200, {}, json.dumps({"entities": [{
+                "pk": 1,
+                "tableName": "Content",
+                "columns": [{"name": "cntn_id", "value": "b"}]}]}))
+
+        responses.add_callback(
+            responses.POST,
+            'http://localhost:9999/rest/Content/1',
+            callback=request_callback,
+            content_type='application/json',
+        )
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        record = Record({"pk": 1,
+                         "tableName": "Content",
+                         "columns": [{"name": "cntn_id", "value": "a"}]},
+                        slims.slims_api)
+
+        record.cntn_id = "b"
+        self.assertEqual("b", record.cntn_id.value)
+        self.assertEqual({"cntn_id": "b"}, record.changes())
+        record.save()
+        self.assertEqual(1, len(responses.calls))
+        self.assertEqual("b", record.cntn_id.value)
+
+        # Names that are not columns stay regular attributes
+        record.note = "checked"
+        self.assertEqual("checked", record.note)
+        self.assertEqual({}, record.changes())
+
+    @responses.activate
+    def test_save_without_changes(self):
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+        record = Record({"pk": 1,
+                         "tableName": "Content",
+                         "columns": [{"name": "cntn_id", "value": "id"}]},
+                        slims.slims_api)
+
+        record.cntn_id.displayValue = "shown"
+        record.save()
+        self.assertEqual(0, len(responses.calls))
+
     @responses.activate
     def test_add(self):
         slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
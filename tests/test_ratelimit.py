@@ -0,0 +1,77 @@
+import json
+import re
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import responses
+
+from slims.ratelimit import RateLimiter
+from slims.slims import Slims
+
+
+class Test_RateLimit(unittest.TestCase):
+
+    @mock.patch("slims.ratelimit.time")
+    def test_token_bucket(self, clock):
+        clock.monotonic.return_value = 100.0
+        limiter = RateLimiter(10, burst=2)
+
+        # The bucket starts full, the next calls are spaced by 1 / rate
+        waits = [limiter.acquire() for i in range(4)]
+        self.assertEqual([0.0, 0.0], waits[:2])
+        self.assertAlmostEqual(0.1, waits[2])
+        self.assertAlmostEqual(0.2, waits[3])
+
+        # After a quiet second the bucket is full again, but not fuller
+        clock.monotonic.return_value = 101.0
+        self.assertEqual([0.0, 0.0], [limiter.acquire(), limiter.acquire()])
+        self.assertAlmostEqual(0.1, limiter.acquire())
+
+        self.assertEqual(7, limiter.calls)
+        self.assertEqual(3, limiter.delayed)
+        self.assertAlmostEqual(0.4, limiter.waited)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, RateLimiter, 0)
+        self.assertRaises(ValueError, RateLimiter, 1, burst=0)
+
+    @responses.activate
+    def test_rate_limit(self):
+        responses.add(responses.GET, re.compile(r'http://localhost:9999/rest/Content/\d+'),
+                      body=json.dumps({"entities": []}), content_type='application/json')
+        limiter = RateLimiter(50)
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", rate_limiter=limiter)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda i: slims.fetch_by_pk("Content", i), range(6)))
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertEqual(6, limiter.calls)
+
+    @responses.activate
+    def test_max_in_flight(self):
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def request_callback(request):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return (200, {}, json.dumps({"entities": []}))
+
+        responses.add_callback(responses.GET, re.compile(r'http://localhost:9999/rest/Content/\d+'),
+                               callback=request_callback, content_type='application/json')
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", max_in_flight=2)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: slims.fetch_by_pk("Content", i), range(16)))
+
+        self.assertEqual(16, len(responses.calls))
+        self.assertEqual(2, in_flight[1])
@@ -0,0 +1,81 @@
+import copy
+import pickle
+import unittest
+
+from slims.internal import Column, Record, _SlimsApi
+
+
+class Test_Record(unittest.TestCase):
+
+    def content(self):
+        return Record({"pk": 1,
+                       "tableName": "Content",
+                       "columns": [
+                           {"name": "cntn_id", "datatype": "STRING", "value": "sample1"},
+                           {"name": "cntn_quantity", "datatype": "QUANTITY", "value": 4.2, "unit": "mL"},
+                       ]},
+                      None)
+
+    def test_columns_are_created_on_access(self):
+        record = self.content()
+        self.assertNotIn("cntn_id", vars(record))
+        self.assertEqual("sample1", record.cntn_id.value)
+        self.assertIsInstance(vars(record)["cntn_id"], Column)
+        self.assertIs(record.cntn_id, record.column("cntn_id"))
+        self.assertEqual("mL", record.column("cntn_quantity").unit)
+
+    def test_unknown_column(self):
+        record = self.content()
+        self.assertFalse(hasattr(record, "cntn_barCode"))
+        self.assertRaises(KeyError, record.column, "cntn_barCode")
+        self.assertFalse(hasattr(record.cntn_id, "unit"))
+
+    def test_column_reads_from_json(self):
+        record = self.content()
+        record.cntn_id.value = "sample2"
+        self.assertEqual("sample2", record.json_entity["columns"][0]["value"])
+
+    def test_copy_and_pickle(self):
+        record = self.content()
+        record.cntn_id
+        for other in [copy.deepcopy(record), pickle.loads(pickle.dumps(record))]:
+            self.assertEqual("sample1", other.cntn_id.value)
+            self.assertEqual(4.2, other.cntn_quantity.value)
+
+    def test_records_share_the_schema_of_their_table(self):
+        slims_api = _SlimsApi("http://localhost:9999", "admin", "admin")
+
+        def entity(pk, editable):
+            return {"pk": pk,
+                    "tableName": "Content",
+                    "columns": [
+                        {"name": "cntn_id", "title": "Id", "datatype": "STRING", "editable": editable,
+                         "value": "sample" + str(pk), "displayValue": "sample" + str(pk)},
+                    ]}
+
+        first = slims_api.record(entity(1, True))
+        second = slims_api.record(entity(2, False))
+
+        self.assertIs(first.schema, second.schema)
+        self.assertEqual({"name": "cntn_id", "value": "sample2", "displayValue": "sample2", "editable": False},
+                         second.json_entity["columns"][0])
+        self.assertEqual("Id", second.cntn_id.title)
+        self.assertEqual("STRING", second.cntn_id.datatype)
+        self.assertEqual(True, first.cntn_id.editable)
+        self.assertEqual(False, second.cntn_id.editable)
+        self.assertEqual("sample2", second.cntn_id.value)
+
+    def test_links(self):
+        record = Record({"pk": 1,
+                         "tableName": "Content",
+                         "columns": [],
+                         "links": [{"rel": "cntn_fk_contentType",
+                                    "href": "http://localhost:9999/rest/ContentType/2"},
+                                   {"rel": "-rslt_fk_content",
+                                    "href": "http://localhost:9999/rest/Result?rslt_fk_content=1"}]},
+                        None)
+        self.assertEqual({"cntn_fk_contentType": "http://localhost:9999/rest/ContentType/2",
+                          "-rslt_fk_content": "http://localhost:9999/rest/Result?rslt_fk_content=1"},
+                         record.links())
+        self.assertIs(record.links(), record.links())
+        self.assertEqual({}, self.content().links())
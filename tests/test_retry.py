@@ -0,0 +1,133 @@
+import unittest
+from unittest import mock
+
+import requests
+import responses
+
+from slims.internal import _SlimsApiException
+from slims.retry import RetryPolicy
+from slims.slims import Slims
+
+
+def content(pk):
+    return {"entities": [{"pk": pk, "tableName": "Content",
+                          "columns": [{"name": "cntn_id", "value": "DNA" + str(pk)}]}]}
+
+
+@mock.patch("slims.internal.time.sleep")
+class Test_Retry(unittest.TestCase):
+
+    @responses.activate
+    def test_get_is_retried(self, sleep):
+        url = 'http://localhost:9999/rest/Content/1'
+        responses.add(responses.GET, url, body="Service unavailable", status=503)
+        responses.add(responses.GET, url, body="Too many requests", status=429, headers={"Retry-After": "2"})
+        responses.add(responses.GET, url, json=content(1), status=200)
+
+        policy = RetryPolicy(max_attempts=3, backoff=1, jitter=0)
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", retry_policy=policy)
+        record = slims.fetch_by_pk("Content", 1)
+
+        self.assertEqual("DNA1", record.cntn_id.value)
+        self.assertEqual([mock.call(1), mock.call(2.0)], sleep.call_args_list)
+        self.assertEqual(3, policy.attempts)
+        self.assertEqual(2, policy.retries)
+        self.assertEqual({"503": 1, "429": 1}, policy.retries_by_reason)
+
+    @responses.activate
+    def test_gives_up_after_max_attempts(self, sleep):
+        responses.add(responses.GET, 'http://localhost:9999/rest/Content/1', body="Bad gateway", status=502)
+
+        policy = RetryPolicy(max_attempts=2)
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", retry_policy=policy)
+
+        self.assertRaises(_SlimsApiException, slims.fetch_by_pk, "Content", 1)
+        self.assertEqual(2, len(responses.calls))
+        self.assertEqual(1, policy.exhausted)
+
+    @responses.activate
+    def test_add_is_not_retried(self, sleep):
+        responses.add(responses.PUT, 'http://localhost:9999/rest/Content', body="Gateway timeout", status=504)
+
+        policy = RetryPolicy()
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", retry_policy=policy)
+
+        self.assertRaises(_SlimsApiException, slims.add, "Content", {"cntn_id": "DNA1"})
+        self.assertEqual(1, len(responses.calls))
+        self.assertEqual(0, policy.retries)
+
+    @responses.activate
+    def test_connection_error_is_retried(self, sleep):
+        url = 'http://localhost:9999/rest/Content/1'
+        responses.add(responses.DELETE, url, body=requests.ConnectionError("Connection reset"))
+        responses.add(responses.DELETE, url, status=200)
+
+        policy = RetryPolicy()
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", retry_policy=policy)
+        slims.slims_api.delete("Content/1")
+
+        self.assertEqual(2, len(responses.calls))
+        self.assertEqual({"ConnectionError": 1}, policy.retries_by_reason)
+
+    @responses.activate
+    def test_no_retries_by_default(self, sleep):
+        responses.add(responses.GET, 'http://localhost:9999/rest/Content/1', body="Service unavailable", status=503)
+
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin")
+
+        self.assertRaises(_SlimsApiException, slims.fetch_by_pk, "Content", 1)
+        self.assertEqual(1, len(responses.calls))
+        sleep.assert_not_called()
+
+    def test_connection_refused_is_retried_for_any_method(self, sleep):
+        policy = RetryPolicy(max_attempts=2)
+        slims = Slims("testSlims", "http://127.0.0.1:1", "admin", "admin", retry_policy=policy)
+
+        self.assertRaises(requests.ConnectionError, slims.slims_api.put, "Content", {"cntn_id": "DNA1"})
+        self.assertEqual(2, policy.attempts)
+        self.assertEqual(1, policy.retries)
+
+    def test_wait(self, sleep):
+        policy = RetryPolicy(backoff=0.5, max_backoff=3, jitter=0.5)
+        for attempt, wait in [(1, 0.5), (2, 1), (3, 2), (4, 3), (10, 3)]:
+            self.assertLessEqual(policy.wait(attempt), wait)
+            self.assertGreaterEqual(policy.wait(attempt), wait / 2)
+
+    def test_retry_failure(self, sleep):
+        policy = RetryPolicy(max_attempts=3, backoff=1, jitter=0)
+
+        self.assertEqual(1, policy.retry_failure(_SlimsApiException("Unavailable", 503), 1))
+        self.assertEqual(2, policy.retry_failure(requests.exceptions.ChunkedEncodingError(), 2))
+        self.assertIsNone(policy.retry_failure(requests.ConnectionError(), 3))
+        self.assertIsNone(policy.retry_failure(_SlimsApiException("Not allowed", 400), 1))
+        self.assertIsNone(policy.retry_failure(ValueError(), 1))
+        self.assertEqual({"503": 1, "ChunkedEncodingError": 1}, policy.retries_by_reason)
+        self.assertEqual(1, policy.exhausted)
+
+    @responses.activate
+    def test_bulk_rows_are_not_retried_again(self, sleep):
+        responses.add(responses.DELETE, 'http://localhost:9999/rest/Content/1', status=503)
+
+        policy = RetryPolicy(max_attempts=2)
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", retry_policy=policy)
+        result = slims.remove_many([1], table="Content", retries=3)
+
+        self.assertEqual(503, result.errors[0].status_code)
+        self.assertEqual(0, result.retries)
+        self.assertEqual(2, len(responses.calls))
+        self.assertEqual(1, policy.retries)
+
+    @responses.activate
+    def test_bulk_rows_are_retried_when_the_policy_does_not_cover_them(self, sleep):
+        url = 'http://localhost:9999/rest/Content/1'
+        responses.add(responses.POST, url, body="Service unavailable", status=503)
+        responses.add(responses.POST, url, json=content(1), status=200)
+
+        policy = RetryPolicy()
+        slims = Slims("testSlims", "http://localhost:9999", "admin", "admin", retry_policy=policy)
+        result = slims.update_many([1], {"cntn_id": "DNA1"}, table="Content")
+
+        self.assertEqual(0, result.failed)
+        self.assertEqual(1, result.retries)
+        self.assertEqual(2, len(responses.calls))
+        self.assertEqual([mock.call(0.5)], sleep.call_args_list)